@@ -0,0 +1,149 @@
+"""
+Lag do event loop enquanto mensagens simuladas passam por InteractionCog.on_message.
+
+    python benchmarks/bench_event_loop_lag.py --messages 5000
+
+Usa um ranking.db temporário: primeiro com o caminho antigo (um commit por
+mensagem e outro por XP, direto no event loop) e depois com o atual (buffer em
+memória gravado pelo flush_pending no db_async). As DMs do notifier ficam
+desligadas nos dois casos.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="jarvis-bench-"))  # o db.py abre ranking.db no cwd
+
+from discord.ext import tasks
+
+import db
+import db_async
+from cogs import interaction
+
+PROBE_INTERVAL = 0.001
+
+
+class InlineDB:
+    """O on_message antigo: increment_message_count e add_xp com commit na hora."""
+
+    def __getattr__(self, name):
+        return getattr(db, name)
+
+    def buffer_message(self, user_id, guild_id, amount=1):
+        db.increment_message_count(user_id, guild_id, amount)
+        return False
+
+    def buffer_xp(self, user_id, guild_id, amount):
+        db.add_xp(user_id, guild_id, amount)
+        return False
+
+
+class InlineAsyncDB:
+    """Substitui o db_async rodando cada chamada no próprio event loop."""
+
+    def __getattr__(self, name):
+        func = getattr(db, name)
+
+        async def call(*args, **kwargs):
+            return func(*args, **kwargs)
+        return call
+
+    async def run(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+def _silent(*args, **kwargs):
+    return None
+
+
+def fake_message(user_id: int, guild):
+    author = SimpleNamespace(
+        id=user_id,
+        bot=False,
+        roles=[],
+        display_avatar=SimpleNamespace(url="https://cdn.discordapp.com/embed/avatars/0.png"),
+        send=_noop,
+    )
+    return SimpleNamespace(author=author, guild=guild, content="bench")
+
+
+async def probe_lag(samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        samples.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_case(label: str, sync_backend, async_backend, messages: int, users: int, burst: int):
+    interaction.db = sync_backend
+    interaction.db_async = async_backend
+    never_ready = asyncio.Event()
+    bot = SimpleNamespace(wait_until_ready=never_ready.wait, get_guild=lambda _id: None)
+    cog = interaction.InteractionCog(bot)
+    cog.notifier.notify = _silent
+    guild = SimpleNamespace(id=hash(label) & 0xFFFFFFF, name="bench")
+
+    samples, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_lag(samples, stop))
+    start = time.perf_counter()
+
+    pending = []
+    for i in range(messages):
+        pending.append(asyncio.create_task(cog.on_message(fake_message(i % users, guild))))
+        if i % burst == burst - 1:
+            await asyncio.sleep(0)
+    await asyncio.gather(*pending)
+    await async_backend.flush_pending()
+
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    for attr in dir(cog):
+        loop = getattr(cog, attr, None)
+        if isinstance(loop, tasks.Loop):
+            loop.cancel()
+
+    lag_ms = [s * 1000 for s in samples] or [0.0]
+    print(
+        f"{label:<9} {messages} msgs in {elapsed:6.2f}s | loop lag ms "
+        f"p50={percentile(lag_ms, 50):7.2f} p95={percentile(lag_ms, 95):7.2f} "
+        f"p99={percentile(lag_ms, 99):7.2f} max={max(lag_ms):7.2f} "
+        f"mean={statistics.mean(lag_ms):7.2f}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2500)
+    parser.add_argument("--burst", type=int, default=50, help="mensagens despachadas por iteração do loop")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    db.init_db()
+
+    await run_case("inline", InlineDB(), InlineAsyncDB(), args.messages, args.users, args.burst)
+    await run_case("buffered", db, db_async, args.messages, args.users, args.burst)
+    db_async.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Tempo de renderização do card de perfil (profile_utils.generate_profile_image).
+
+    python benchmarks/bench_profile_card.py --cards 100
+    python benchmarks/bench_profile_card.py --cards 100 --workers 4
+
+Com --workers, os cards saem em rajada pelo render_service.ProfileRenderer e o
+resultado é o throughput do pool comparado ao processo único.
+
+O avatar aponta para uma porta fechada, então o download falha na hora e o
+tempo medido é o do desenho (gradiente, sombra, textos, barra de XP e PNG).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import profile_utils
+from utils.render_service import ProfileRenderer
+
+AVATAR_URL = "http://127.0.0.1:9/avatar.png"
+
+
+async def burst(cards: int, workers: int, badges: list):
+    renderer = ProfileRenderer(workers=workers, max_queue=cards)
+    # aquece os processos antes de medir
+    await asyncio.gather(*(
+        renderer.render("Benchmark", None, 0, 0, 0, 0, 0, badges) for _ in range(workers)
+    ))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        renderer.render("Benchmark", None, random.randint(0, 20000), 1234, 7200, 10, 5, badges)
+        for _ in range(cards)
+    ))
+    elapsed = time.perf_counter() - start
+    renderer.shutdown()
+    print(f"pool({workers}) {cards} cards em {elapsed:.2f}s | {cards / elapsed:.1f} cards/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=0, help="também mede uma rajada pelo pool de processos")
+    args = parser.parse_args()
+
+    member = SimpleNamespace(
+        display_name="Benchmark",
+        display_avatar=SimpleNamespace(url=AVATAR_URL),
+    )
+    badges = list(profile_utils.BADGE_EMOJIS)[:3]
+
+    timings = []
+    for _ in range(args.cards):
+        xp = random.randint(0, 20000)
+        start = time.perf_counter()
+        profile_utils.generate_profile_image(member, xp, 1234, 7200, 10, 5, badges)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p / 100))]
+    print(
+        f"{args.cards} cards | ms p50={pct(50):.1f} p95={pct(95):.1f} "
+        f"max={timings[-1]:.1f} mean={statistics.mean(timings):.1f} "
+        f"| {1000 / statistics.mean(timings):.1f} cards/s"
+    )
+
+    if args.workers:
+        asyncio.run(burst(args.cards, args.workers, badges))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Página do ranking e posição do usuário numa guild grande.
+
+    python benchmarks/bench_ranking.py --users 50000
+
+Compara o caminho antigo (get_top_users + sorted em Python) com
+get_ranking_page + get_user_rank, servidos pelo leaderboard em memória da guild
+(a primeira chamada carrega o leaderboard e fica fora da medição).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="jarvis-bench-"))  # o db.py abre ranking.db no cwd
+
+import db
+
+GUILD_ID = 1
+
+
+def old_path(user_id):
+    data = sorted(db.get_top_users(GUILD_ID), key=lambda x: x[1], reverse=True)
+    page = data[:10]
+    rank = next(i for i, row in enumerate(data, start=1) if row[0] == user_id)
+    return page, rank
+
+
+def new_path(user_id):
+    page = db.get_ranking_page(GUILD_ID, "xp", 10, 0)
+    rank = db.get_user_rank(user_id, GUILD_ID, "xp")
+    return page, rank
+
+
+def measure(label, func, users, rounds):
+    timings = []
+    for _ in range(rounds):
+        user_id = random.randrange(users)
+        start = time.perf_counter()
+        func(user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p / 100))]
+    print(f"{label:<6} ms p50={pct(50):7.2f} p95={pct(95):7.2f} mean={statistics.mean(timings):7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    db.init_db()
+    db.cursor.executemany(
+        "INSERT INTO users (user_id, guild_id, xp, vitorias, derrotas) VALUES (?, ?, ?, ?, ?)",
+        [(i, GUILD_ID, random.randint(0, 50000), random.randint(0, 100), random.randint(0, 100)) for i in range(args.users)]
+    )
+    db.conn.commit()
+    db.count_ranked_users(GUILD_ID)
+
+    measure("old", old_path, args.users, args.rounds)
+    measure("new", new_path, args.users, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
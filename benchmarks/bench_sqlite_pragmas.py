@@ -0,0 +1,115 @@
+"""
+Escritas/s e latência de leitura do ranking.db com uma carga mista concorrente.
+
+    python benchmarks/bench_sqlite_pragmas.py --seconds 5 --readers 4
+
+Compara a conexão padrão do sqlite3 (rollback journal, synchronous=FULL) com o
+bootstrap do db._connect (WAL, synchronous=NORMAL, cache/mmap, leitores próprios).
+Um thread grava XP commit a commit enquanto os leitores buscam o top 10 e perfis.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="jarvis-bench-"))  # o db.py abre ranking.db no cwd
+
+import db
+
+GUILD_ID = 1
+
+
+def default_connect(path, readonly=False):
+    return sqlite3.connect(path, check_same_thread=False, timeout=30)
+
+
+def seed(connection, users):
+    connection.execute('''
+        CREATE TABLE users (
+            user_id INTEGER, guild_id INTEGER, xp INTEGER DEFAULT 0, level INTEGER DEFAULT 0,
+            vitorias INTEGER DEFAULT 0, derrotas INTEGER DEFAULT 0, PRIMARY KEY(user_id, guild_id)
+        )
+    ''')
+    connection.executemany(
+        "INSERT INTO users (user_id, guild_id, xp) VALUES (?, ?, ?)",
+        [(i, GUILD_ID, random.randint(0, 50000)) for i in range(users)]
+    )
+    connection.commit()
+
+
+def writer(connection, users, stop, counter):
+    cur = connection.cursor()
+    while not stop.is_set():
+        cur.execute(
+            "UPDATE users SET xp = xp + ? WHERE user_id = ? AND guild_id = ?",
+            (10, random.randrange(users), GUILD_ID)
+        )
+        connection.commit()
+        counter[0] += 1
+
+
+def reader(connection, users, stop, latencies):
+    cur = connection.cursor()
+    while not stop.is_set():
+        start = time.perf_counter()
+        cur.execute(
+            "SELECT user_id, xp FROM users WHERE guild_id = ? ORDER BY xp DESC LIMIT 10",
+            (GUILD_ID,)
+        )
+        cur.fetchall()
+        cur.execute(
+            "SELECT xp, level, vitorias, derrotas FROM users WHERE user_id = ? AND guild_id = ?",
+            (random.randrange(users), GUILD_ID)
+        )
+        cur.fetchone()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def run_case(label, connect, seconds, readers, users):
+    path = f"{label}.db"
+    write_conn = connect(path)
+    seed(write_conn, users)
+
+    stop = threading.Event()
+    counter = [0]
+    latencies = []
+    threads = [threading.Thread(target=writer, args=(write_conn, users, stop, counter))]
+    for _ in range(readers):
+        threads.append(threading.Thread(target=reader, args=(connect(path, readonly=True), users, stop, latencies)))
+
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+    print(
+        f"{label:<8} writes/s={counter[0] / seconds:9.1f} | read ms "
+        f"p50={pct(50):6.2f} p95={pct(95):6.2f} p99={pct(99):6.2f} "
+        f"mean={statistics.mean(latencies):6.2f} ({len(latencies)} leituras)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=20000)
+    args = parser.parse_args()
+
+    run_case("default", default_connect, args.seconds, args.readers, args.users)
+    run_case("tuned", db._connect, args.seconds, args.readers, args.users)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,12 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import db
+import db_async
 import math
 import functools
 from utils.logger import send_log
 from utils import profile_utils
+from utils.member_resolver import MemberResolver
 
 
 
@@ -24,22 +25,37 @@ class XPView(discord.ui.View):
        else:
            await interaction.response.send_message("⚠️ Ranking não disponível.", ephemeral=True)
 
+PAGE_SIZE = 10
+
 class RankingView(discord.ui.View):
-    def __init__(self, bot, interaction, data_func):
+    def __init__(self, bot, interaction, resolver: MemberResolver):
         super().__init__(timeout=60)
         self.bot = bot
         self.interaction = interaction
-        self.data_func = data_func
+        self.resolver = resolver
+        self.guild_id = interaction.guild.id
         self.current_page = 0
         self.category = "xp"
+        self.page_data = []
+        self.total_pages = 1
+
+    # só a página atual vem do banco; o total de páginas é recontado ao trocar de categoria
+    async def load(self, category: str):
+        self.category = category
+        self.current_page = 0
+        total = await db_async.count_ranked_users(self.guild_id)
+        self.total_pages = math.ceil(total / PAGE_SIZE) or 1
+        await self.load_page()
 
-        self.top_data = self.data_func(self.category)
-        self.total_pages = math.ceil(len(self.top_data) / 10) or 1
+    async def load_page(self):
+        self.page_data = await db_async.get_ranking_page(
+            self.guild_id, self.category, PAGE_SIZE, self.current_page * PAGE_SIZE
+        )
 
     async def update_embed(self, interaction: discord.Interaction):
-        start = self.current_page * 10
-        end = start + 10
-        page_data = self.top_data[start:end]
+        start = self.current_page * PAGE_SIZE
+        page_data = self.page_data
+        page_levels = profile_utils.calculate_levels([row[1] for row in page_data])
         guild = self.interaction.guild
 
         embed = discord.Embed(
@@ -48,10 +64,11 @@ class RankingView(discord.ui.View):
             color=discord.Color.gold()
         )
 
-        for i, (user_id, xp, vitorias, derrotas) in enumerate(page_data, start=start + 1):
-            try:
-                user = guild.get_member(user_id) or await self.bot.fetch_user(user_id)
-            except:
+        users = await self.resolver.resolve_many(guild, [row[0] for row in page_data])
+
+        for i, ((user_id, xp, vitorias, derrotas), level) in enumerate(zip(page_data, page_levels), start=start + 1):
+            user = users[user_id]
+            if user is None:
                 continue
 
             medalha = (
@@ -62,7 +79,7 @@ class RankingView(discord.ui.View):
             )
 
             if self.category == "xp":
-                valor = f"✨ **XP:** {xp}"
+                valor = f"✨ **XP:** {xp} | 🧬 **Nível:** {level}"
             elif self.category == "vitorias":
                 valor = f"🏆 **Vitórias:** {vitorias}"
             else:
@@ -74,16 +91,13 @@ class RankingView(discord.ui.View):
                 inline=False
             )
 
-        if page_data:
-            top1_user = guild.get_member(page_data[0][0]) or await self.bot.fetch_user(page_data[0][0])
-            embed.set_thumbnail(url=top1_user.display_avatar.url)
+        if page_data and users[page_data[0][0]]:
+            embed.set_thumbnail(url=users[page_data[0][0]].display_avatar.url)
 
-        user_id = self.interaction.user.id
-        for i, (uid, xp, v, d) in enumerate(self.top_data, start=1):
-            if uid == user_id:
-                stat = xp if self.category == "xp" else v if self.category == "vitorias" else d
-                embed.set_footer(text=f"📍 Você está na posição #{i} ({self.category}: {stat})")
-                break
+        own_rank = await db_async.get_user_rank(self.interaction.user.id, self.guild_id, self.category)
+        if own_rank:
+            position, stat = own_rank
+            embed.set_footer(text=f"📍 Você está na posição #{position} ({self.category}: {stat})")
         else:
             embed.set_footer(text="📍 Você ainda não entrou no ranking!")
 
@@ -98,6 +112,7 @@ class RankingView(discord.ui.View):
             return await interaction.response.send_message("⛔ Apenas quem usou o comando pode interagir.", ephemeral=True)
         if self.current_page > 0:
             self.current_page -= 1
+            await self.load_page()
             await self.update_embed(interaction)
         else:
             await interaction.response.defer()
@@ -108,6 +123,7 @@ class RankingView(discord.ui.View):
             return await interaction.response.send_message("⛔ Apenas quem usou o comando pode interagir.", ephemeral=True)
         if self.current_page < self.total_pages - 1:
             self.current_page += 1
+            await self.load_page()
             await self.update_embed(interaction)
         else:
             await interaction.response.defer()
@@ -116,35 +132,27 @@ class RankingView(discord.ui.View):
     async def sort_xp(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.interaction.user:
             return await interaction.response.send_message("⛔ Apenas quem usou o comando pode interagir.", ephemeral=True)
-        self.category = "xp"
-        self.top_data = self.data_func("xp")
-        self.current_page = 0
-        self.total_pages = math.ceil(len(self.top_data) / 10) or 1
+        await self.load("xp")
         await self.update_embed(interaction)
 
     @discord.ui.button(label="Vitórias", style=discord.ButtonStyle.success)
     async def sort_vitorias(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.interaction.user:
             return await interaction.response.send_message("⛔ Apenas quem usou o comando pode interagir.", ephemeral=True)
-        self.category = "vitorias"
-        self.top_data = self.data_func("vitorias")
-        self.current_page = 0
-        self.total_pages = math.ceil(len(self.top_data) / 10) or 1
+        await self.load("vitorias")
         await self.update_embed(interaction)
 
     @discord.ui.button(label="Derrotas", style=discord.ButtonStyle.danger)
     async def sort_derrotas(self, interaction: discord.Interaction, button: discord.ui.Button):
         if interaction.user != self.interaction.user:
             return await interaction.response.send_message("⛔ Apenas quem usou o comando pode interagir.", ephemeral=True)
-        self.category = "derrotas"
-        self.top_data = self.data_func("derrotas")
-        self.current_page = 0
-        self.total_pages = math.ceil(len(self.top_data) / 10) or 1
+        await self.load("derrotas")
         await self.update_embed(interaction)
 
 class XP(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.members = MemberResolver(bot)
         
     @app_commands.command(name='getxp', description='Visualiza o XP, vitórias e derrotas de um usuário')
     @app_commands.describe(member='O usuário que você deseja consultar')
@@ -152,8 +160,8 @@ class XP(commands.Cog):
         member = member or interaction.user
         guild_id = interaction.guild.id
 
-        db.ensure_user_exists(member.id, guild_id)
-        data = db.get_user_data(member.id, guild_id)
+        await db_async.ensure_user_exists(member.id, guild_id)
+        data = await db_async.get_user_data(member.id, guild_id)
 
         if not data:
             embed = discord.Embed(
@@ -203,18 +211,8 @@ class XP(commands.Cog):
 
 
     async def send_ranking(self, interaction: discord.Interaction):
-        guild_id = interaction.guild.id
-
-        def get_data(tipo):
-            data = db.get_top_users(guild_id)
-            if tipo == "xp":
-                return sorted(data, key=lambda x: x[1], reverse=True)
-            elif tipo == "vitorias":
-                return sorted(data, key=lambda x: x[2], reverse=True)
-            else:
-                return sorted(data, key=lambda x: x[3], reverse=True)
-
-        view = RankingView(self.bot, interaction, get_data)
+        view = RankingView(self.bot, interaction, self.members)
+        await view.load("xp")
         embed = discord.Embed(
             title="🏆 Ranking do Servidor",
             description="Carregando dados...",
@@ -2,8 +2,21 @@ import discord
 from discord.ext import commands, tasks
 from discord import app_commands, ui
 import db
+import db_async
 from utils.logger import send_log
+from utils.log_channels import log_channels
 import functools
+import asyncio
+
+
+# Reconciliação de membros: o cache de cada guild (known_members) acompanha os
+# eventos de entrada/saída, e o job periódico só cadastra quem está no gateway e
+# não está no cache. A cada ciclo o cache é recarregado do banco (uma consulta por
+# guild), então deleções feitas por outros caminhos (delete_guild_data,
+# factory_reset, etc.) são corrigidas no próximo ciclo. As guilds são espalhadas ao
+# longo de SYNC_SPREAD_SECONDS em vez de varridas todas de uma vez no começo da hora.
+SYNC_INTERVAL_HOURS = 1
+SYNC_SPREAD_SECONDS = 30 * 60
 
 
 def log_command(title_getter, fields_getter):
@@ -60,7 +73,7 @@ class SetXPModal(ui.Modal, title="Definir XP e Estatísticas"):
                 )
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-            db.set_user_data(self.member.id, interaction.guild.id, xp, vitorias, derrotas)
+            await db_async.set_user_data(self.member.id, interaction.guild.id, xp, vitorias, derrotas)
 
             embed = discord.Embed(
                 title="✅ Dados cadastrados",
@@ -131,17 +144,41 @@ class MemberSelectView(ui.View):
 class Admin(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.known_members = {}
         self.sync_all_members.start()
 
+    def cog_unload(self):
+        self.sync_all_members.cancel()
+
+    async def reconcile_guild(self, guild: discord.Guild, refresh: bool = False):
+        known = self.known_members.get(guild.id)
+        if known is None or refresh:
+            known = await db_async.get_guild_user_ids(guild.id)
+            self.known_members[guild.id] = known
+
+        missing = [member.id for member in guild.members if not member.bot and member.id not in known]
+        if not missing:
+            return 0
+
+        # só o que entrou de fato; se o insert falhou, o próximo ciclo tenta de novo
+        added = await db_async.ensure_users_exist(guild.id, missing)
+        known.update(added)
+        return len(added)
+
+    def forget_member(self, guild_id: int, user_id: int):
+        known = self.known_members.get(guild_id)
+        if known is not None:
+            known.discard(user_id)
+
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild):
-        total = 0
-        for member in guild.members:
-            if not member.bot:
-                await self.register_member(member)
-                total += 1
-        print(f"[INFO] Verificação inicial concluída para o servidor {guild.name}. {total} membros cadastrados.")
+        added = await self.reconcile_guild(guild)
+        print(f"[INFO] Verificação inicial concluída para o servidor {guild.name}. {added} membros cadastrados.")
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.known_members.pop(guild.id, None)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
@@ -150,10 +187,13 @@ class Admin(commands.Cog):
 
     async def register_member(self, member: discord.Member):
         try:
-            db.ensure_user_exists(member.id, member.guild.id)
+            await db_async.ensure_user_exists(member.id, member.guild.id)
+            known = self.known_members.get(member.guild.id)
+            if known is not None:
+                known.add(member.id)
             print(f"[INFO] Usuário {member} registrado automaticamente.")
 
-            canal_log = discord.utils.get(member.guild.text_channels, name="bot-logs")
+            canal_log = await log_channels.resolve(member.guild, "bot-logs")
             if canal_log:
                 embed = discord.Embed(
                     title="✅ Novo usuário cadastrado",
@@ -164,23 +204,31 @@ class Admin(commands.Cog):
         except Exception as e:
             print(f"[ERRO] Falha ao registrar {member}: {e}")
 
-    @tasks.loop(hours=1)
+    @tasks.loop(hours=SYNC_INTERVAL_HOURS)
     async def sync_all_members(self):
-        for guild in self.bot.guilds:
-            total = 0
-            for member in guild.members:
-                if not member.bot:
-                    db.ensure_user_exists(member.id, guild.id)
-                    total += 1
-            print(f"[SYNC] {total} membros verificados/cadastrados no servidor {guild.name}.")
+        guilds = list(self.bot.guilds)
+        delay = SYNC_SPREAD_SECONDS / max(1, len(guilds))
+        total = 0
+        for guild in guilds:
+            try:
+                total += await self.reconcile_guild(guild, refresh=True)
+            except Exception as e:
+                print(f"[ERRO] Falha ao reconciliar membros de {guild.name}: {e}")
+            await asyncio.sleep(delay)
+        print(f"[SYNC] {len(guilds)} servidores reconciliados, {total} membros cadastrados.")
+
+    @sync_all_members.before_loop
+    async def before_sync_all_members(self):
+        await self.bot.wait_until_ready()
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
         try:
-            db.delete_user(member.id, member.guild.id)
+            await db_async.delete_user(member.id, member.guild.id)
+            self.forget_member(member.guild.id, member.id)
             print(f"[INFO] Usuário {member} removido do DB (saiu de {member.guild.name}).")
 
-            canal_log = discord.utils.get(member.guild.text_channels, name="bot-logs")
+            canal_log = await log_channels.resolve(member.guild, "bot-logs")
             if canal_log:
                 embed = discord.Embed(
                     title="❌ Usuário removido",
@@ -218,7 +266,8 @@ class Admin(commands.Cog):
 
         async def confirmar(inter: discord.Interaction, member: discord.Member):
             await inter.response.defer(ephemeral=True)
-            db.clear_user_data(member.id, inter.guild.id)
+            await db_async.clear_user_data(member.id, inter.guild.id)
+            self.forget_member(inter.guild.id, member.id)
 
             embed = discord.Embed(
                 title="🧹 Dados Resetados",
@@ -256,7 +305,7 @@ class Admin(commands.Cog):
 
         async def confirmar(inter: discord.Interaction, member: discord.Member):
             await inter.response.defer(ephemeral=True)
-            db.reset_user_xp(member.id, inter.guild.id)
+            await db_async.reset_user_xp(member.id, inter.guild.id)
 
             embed = discord.Embed(
                 title="💤 XP Resetado",
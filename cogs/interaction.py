@@ -3,10 +3,18 @@ from discord.ext import commands, tasks
 from discord import app_commands, Interaction, TextStyle
 from discord.ui import View, Select, Modal, TextInput
 import time
+import asyncio
 import datetime
 import logging
+import io
 from utils import profile_utils
+from utils.render_service import ProfileRenderer, RendererBusy
+from utils.avatar_cache import AvatarCache
+from utils.card_cache import CardCache
+from utils.voice_sessions import VoiceSessionRegistry
+from utils.notifier import Notifier
 import db
+import db_async
 
 logging.basicConfig(level=logging.INFO, format="[Interaction] %(message)s")
 
@@ -15,32 +23,58 @@ TEXT_XP = 10
 TEXT_COOLDOWN_MINUTES = 1
 VOICE_XP = 1
 VOICE_INTERVAL_HOURS = 1
-REALTIME_UPDATE_INTERVAL_SECONDS = 5
+WRITE_BEHIND_INTERVAL_SECONDS = 5
+# tempo em call: acumulado em memória e gravado em lote a cada CALL_TIME_FLUSH_SECONDS;
+# depois de um restart, sessões abertas só continuam se o checkpoint tiver até
+# VOICE_RECOVERY_GRACE_SECONDS, senão terminam no último checkpoint
+CALL_TIME_FLUSH_SECONDS = 60
+VOICE_RECOVERY_GRACE_SECONDS = 300
 
 TEXT_COOLDOWN = TEXT_COOLDOWN_MINUTES * 60 
 VOICE_INTERVAL = VOICE_INTERVAL_HOURS * 3600  
-REALTIME_UPDATE_INTERVAL = REALTIME_UPDATE_INTERVAL_SECONDS
 
 class InteractionCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.active_users = {}    
+        self.voice = VoiceSessionRegistry()
         self.cooldowns = {}       
-
+        self._flush_task = None
+        # tempo em call cuja gravação falhou; entra na frente do próximo flush
+        self._retry_credits = []
+        self._retry_ended = []
+        self.notifier = Notifier()
+        self.renderer = ProfileRenderer()
+        self.avatars = AvatarCache()
+        self.cards = CardCache()
+
+        self.flush_pending_loop.start()
         self.give_xp_loop.start()
         self.update_call_time_loop.start()
-        self.cleanup_boost_loop.start()  
         
-    @tasks.loop(hours=24)
-    async def cleanup_boost_loop(self):
-        db.cleanup_expired_boosts()
-
-    @cleanup_boost_loop.before_loop
-    async def before_cleanup_boost_loop(self):
-        await self.bot.wait_until_ready()
+    async def cog_load(self):
+        await self.notifier.start()
+
+    async def cog_unload(self):
+        self.flush_pending_loop.cancel()
+        self.give_xp_loop.cancel()
+        self.notifier.stop()
+        self.update_call_time_loop.cancel()
+        # as sessões continuam gravadas em voice_sessions e são retomadas no próximo start
+        await self.flush_call_time()
+        self.renderer.shutdown()
+        await self.avatars.close()
+        await db_async.flush_pending()
+
+    def request_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(db_async.flush_pending())
+
+    @tasks.loop(seconds=WRITE_BEHIND_INTERVAL_SECONDS)
+    async def flush_pending_loop(self):
+        await db_async.flush_pending()
 
     
-    def get_boost_multiplier(self, member: discord.Member, guild_id: int) -> float:
+    async def get_boost_multiplier(self, member: discord.Member, guild_id: int) -> float:
 
         if not member:
             return 1.0
@@ -48,12 +82,13 @@ class InteractionCog(commands.Cog):
 
         has_boost_role = any(role.name == "⚡ BoostXP" for role in member.roles)
 
+        # boosts vêm do registro em memória do db, sem query
         if has_boost_role:
             return db.get_active_boost_multiplier(member.id, guild_id)
         else:
 
             if db.check_boost_active(member.id, guild_id):
-                db.remove_boost(member.id, guild_id)
+                await db_async.remove_boost(member.id, guild_id)
             return 1.0
     
     @commands.Cog.listener()
@@ -65,94 +100,155 @@ class InteractionCog(commands.Cog):
         guild_id = message.guild.id
         now = time.time()
 
-        db.increment_message_count(user_id, guild_id, 1)
+        if db.buffer_message(user_id, guild_id, 1):
+            self.request_flush()
 
         cooldown_key = (guild_id, user_id)
         if cooldown_key not in self.cooldowns or (now - self.cooldowns[cooldown_key]) >= TEXT_COOLDOWN:
             self.cooldowns[cooldown_key] = now
             
             base_xp = TEXT_XP
-            multiplier = self.get_boost_multiplier(message.author, message.guild.id)
+            multiplier = await self.get_boost_multiplier(message.author, message.guild.id)
             xp_to_add = int(base_xp * multiplier)
-            db.add_xp(user_id, guild_id, xp_to_add)
+            if db.buffer_xp(user_id, guild_id, xp_to_add):
+                self.request_flush()
 
             logging.info(f"{message.author} ganhou {xp_to_add} XP em {message.guild.name} (multiplicador {multiplier}x)")
 
-            embed = discord.Embed(
-                title="🎉 XP Ganhado!",
-                description=f"Você ganhou **{xp_to_add} XP** no servidor **{message.guild.name}** 💬\nMultiplicador ativo: **{multiplier}x**",
-                color=discord.Color.blue()
+            self.notifier.notify(
+                message.author,
+                "🎉 XP Ganhado!",
+                f"Você ganhou **{xp_to_add} XP** no servidor **{message.guild.name}** 💬 (multiplicador **{multiplier}x**)",
+                color=discord.Color.blue(),
+                footer="Continue participando para ganhar mais XP!"
             )
-            embed.set_thumbnail(url=message.author.display_avatar.url)
-            embed.set_footer(text="Continue participando para ganhar mais XP!")
-
-            try:
-                await message.author.send(embed=embed)
-            except discord.Forbidden:
-                pass
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
         guild_id = member.guild.id
         user_id = member.id
 
-        if after.channel is not None: 
-            self.active_users[user_id] = (guild_id, time.time())
-        elif before.channel is not None and after.channel is None: 
-            if user_id in self.active_users:
-                joined_at = self.active_users[user_id][1]
-                total_time = int(time.time() - joined_at)
-                db.add_call_time(user_id, guild_id, total_time)
-                self.active_users.pop(user_id, None)
+        if before.channel is None and after.channel is not None:
+            self.voice.join(guild_id, user_id, after.channel.id, time.time())
+        elif before.channel is not None and after.channel is not None:
+            # troca de canal (ou mute/deafen) continua a mesma sessão
+            if not self.voice.move(guild_id, user_id, after.channel.id):
+                self.voice.join(guild_id, user_id, after.channel.id, time.time())
+        elif before.channel is not None and after.channel is None:
+            session = self.voice.leave(guild_id, user_id)
+            if session:
+                credit = (user_id, guild_id, int(time.time() - session.accounted_at))
+                if not await db_async.add_call_time_bulk([credit], ended=[(guild_id, user_id)]):
+                    self._retry_credits.append(credit)
+                    self._retry_ended.append((guild_id, user_id))
+
+    # credita o tempo desde o último tick de todas as sessões abertas; só os
+    # segundos inteiros saem de accounted_at, então a fração não se perde
+    def collect_call_time(self, now: float):
+        credits, sessions, advanced = [], [], []
+        for session in self.voice.sessions():
+            seconds = int(now - session.accounted_at)
+            session.accounted_at += seconds
+            credits.append((session.user_id, session.guild_id, seconds))
+            sessions.append((session.guild_id, session.user_id, session.accounted_at, now))
+            advanced.append((session, seconds))
+        return credits, sessions, advanced
+
+    async def flush_call_time(self):
+        credits, sessions, advanced = self.collect_call_time(time.time())
+        retry_credits, self._retry_credits = self._retry_credits, []
+        # quem voltou para a call já tem sessão nova; o DELETE apagaria o checkpoint dela
+        retry_ended = [key for key in self._retry_ended if key not in self.voice]
+        self._retry_ended = []
+        if not (sessions or retry_credits or retry_ended):
+            return
+
+        if await db_async.add_call_time_bulk(retry_credits + credits, sessions, retry_ended):
+            return
 
-    @tasks.loop(seconds=REALTIME_UPDATE_INTERVAL)
-    async def update_call_time_loop(self):
+        # nada foi gravado: devolve os segundos às sessões (ou ao backlog, se
+        # a sessão saiu enquanto o flush rodava)
+        self._retry_credits[:0] = retry_credits
+        self._retry_ended[:0] = retry_ended
+        for session, seconds in advanced:
+            if self.voice.get(session.guild_id, session.user_id) is session:
+                session.accounted_at -= seconds
+            else:
+                self._retry_credits.append((session.user_id, session.guild_id, seconds))
+
+    # refaz o registro a partir do gateway (voice_states) e das sessões gravadas
+    async def recover_voice_sessions(self):
         now = time.time()
-        for user_id, (guild_id, joined_at) in list(self.active_users.items()):
-            delta = int(now - joined_at)
-            if delta >= REALTIME_UPDATE_INTERVAL:
-                db.add_call_time(user_id, guild_id, REALTIME_UPDATE_INTERVAL)
-                self.active_users[user_id] = (guild_id, now)
-                logging.debug(f"[Tempo em tempo real] {user_id} +{REALTIME_UPDATE_INTERVAL}s em {guild_id}")
-                
+        in_voice = VoiceSessionRegistry.snapshot(self.bot.guilds)
+
+        credits, ended = [], []
+        for guild_id, user_id, accounted_at, seen_at in await db_async.get_voice_sessions():
+            channel_id = in_voice.get((guild_id, user_id))
+            if channel_id is not None and now - seen_at <= VOICE_RECOVERY_GRACE_SECONDS:
+                self.voice.leave(guild_id, user_id)
+                self.voice.join(guild_id, user_id, channel_id, seen_at, accounted_at)
+            else:
+                credits.append((user_id, guild_id, int(seen_at - accounted_at)))
+                ended.append((guild_id, user_id))
+
+        for (guild_id, user_id), channel_id in in_voice.items():
+            self.voice.join(guild_id, user_id, channel_id, now)
+
+        if ended and not await db_async.add_call_time_bulk(credits, ended=ended):
+            self._retry_credits.extend(credits)
+            self._retry_ended.extend(ended)
+        logging.info(f"Sessões de voz: {len(self.voice)} ativas em {len(self.voice.counts())} servidores, {len(ended)} encerradas na recuperação")
+
+    @tasks.loop(seconds=CALL_TIME_FLUSH_SECONDS)
+    async def update_call_time_loop(self):
+        await self.flush_call_time()
+
     @update_call_time_loop.before_loop
     async def before_update_call_time_loop(self):
         await self.bot.wait_until_ready()
+        await self.recover_voice_sessions()
             
     @tasks.loop(hours=VOICE_INTERVAL_HOURS)
     async def give_xp_loop(self):
+        # um tick: multiplicadores do registro em memória, todo o XP numa transação
+        # e as DMs na fila do notifier, sem segurar o loop
         try:
-            for user_id, (guild_id, joined_at) in list(self.active_users.items()):
-                now = time.time()
-                delta_seconds = int(now - joined_at)
-                db.add_call_time(user_id, guild_id, delta_seconds)
-                self.active_users[user_id] = (guild_id, now)
-                
-                base_xp = VOICE_XP
-                guild = self.bot.get_guild(guild_id)
-                member = guild.get_member(user_id) if guild else None
-                multiplier = self.get_boost_multiplier(member, guild_id) if member else 1.0
-                xp_to_add = int(base_xp * multiplier)
-                db.add_xp(user_id, guild_id, xp_to_add)
-
-                logging.info(f"Usuário {user_id} ganhou {xp_to_add} XP (voz) em {guild_id}, multiplicador {multiplier}x")
-
-                guild = self.bot.get_guild(guild_id)
-                if guild:
-                    member = guild.get_member(user_id)
-                    if member:
-                        embed = discord.Embed(
-                            title="🎤 XP por Call!",
-                            description=f"Você ganhou **{xp_to_add} XP** por estar em call no servidor **{guild.name}** 🔊\nMultiplicador ativo: **{multiplier}x**",
-                            color=discord.Color.green()
-                        )
-                        embed.set_thumbnail(url=member.display_avatar.url)
-                        embed.set_footer(text="Aproveite sua call e acumule XP!")
-
-                        try:
-                            await member.send(embed=embed)
-                        except discord.Forbidden:
-                            pass
+            members = []
+            for session in self.voice.sessions():
+                guild = self.bot.get_guild(session.guild_id)
+                members.append((session, guild, guild.get_member(session.user_id) if guild else None))
+            if not members:
+                return
+
+            boosts = db.get_active_boost_multipliers([(s.user_id, s.guild_id) for s, _, _ in members])
+
+            grants, notices, stale_boosts = [], [], []
+            for session, guild, member in members:
+                key = (session.user_id, session.guild_id)
+                multiplier = 1.0
+                if member:
+                    if any(role.name == "⚡ BoostXP" for role in member.roles):
+                        multiplier = boosts.get(key, 1.0)
+                    elif key in boosts:
+                        stale_boosts.append(key)
+                xp_to_add = int(VOICE_XP * multiplier)
+                grants.append((*key, xp_to_add))
+                if member:
+                    notices.append((member, guild, xp_to_add, multiplier))
+
+            await db_async.add_xp_bulk(grants)
+            for user_id, guild_id in stale_boosts:
+                await db_async.remove_boost(user_id, guild_id)
+            logging.info(f"XP de voz: {len(grants)} usuários em {len(self.voice.counts())} servidores")
+
+            for member, guild, xp_to_add, multiplier in notices:
+                self.notifier.notify(
+                    member,
+                    "🎤 XP por Call!",
+                    f"Você ganhou **{xp_to_add} XP** por estar em call no servidor **{guild.name}** 🔊 (multiplicador **{multiplier}x**)",
+                    color=discord.Color.green(),
+                    footer="Aproveite sua call e acumule XP!"
+                )
         except Exception as e:
             logging.error(f"Erro no give_xp_loop: {e}")
     
@@ -177,36 +273,46 @@ class InteractionCog(commands.Cog):
             await interaction.response.send_message("Usuário não encontrado.", ephemeral=True)
             return
 
+        await interaction.response.defer(ephemeral=True, thinking=True)
         user_id, guild_id = member.id, guild.id
+        # lida antes dos stats: se algo mudar no meio, o card fica com a versão velha e é refeito depois
+        card_token = (db.get_stats_version(user_id, guild_id), member.display_avatar.key, member.display_name)
 
-        msg_count = db.get_message_count(user_id, guild_id) or 0
-        total_seconds = db.get_call_time(user_id, guild_id) or 0
-        user_data = db.get_user_data(user_id, guild_id)
+        msg_count = await db_async.get_message_count(user_id, guild_id) or 0
+        total_seconds = await db_async.get_call_time(user_id, guild_id) or 0
+        user_data = await db_async.get_user_data(user_id, guild_id)
         xp, level, vitorias, derrotas = user_data if user_data else (0, 0, 0, 0)
-        multiplier = self.get_boost_multiplier(member, guild_id)
+        multiplier = await self.get_boost_multiplier(member, guild_id)
 
         level_data = profile_utils.calculate_level(xp)
         level = level_data["level"]
         progress_pct = int(level_data["progress"] * 100)
 
 
-        new_badges = profile_utils.check_and_award_badges(db, user_id, guild_id, xp, msg_count, total_seconds)
-        badges = profile_utils.get_badges(db, user_id, guild_id)
+        new_badges = await db_async.run(profile_utils.check_and_award_badges, db, user_id, guild_id, xp, msg_count, total_seconds)
+        badges = await db_async.run(profile_utils.get_badges, db, user_id, guild_id)
         badges_str = profile_utils.render_badges(badges)
 
         if new_badges:
+            self.notifier.notify(
+                member,
+                "🏅 Novas Badges!",
+                "Você ganhou novas badges: " + profile_utils.render_badges(new_badges),
+                color=discord.Color.gold()
+            )
+
+        png = self.cards.get(guild_id, user_id, card_token)
+        if png is None:
+            tile = await self.avatars.get_tile(member.display_avatar)
             try:
-                dm = discord.Embed(
-                    title="🏅 Novas Badges!",
-                    description="Você ganhou novas badges: " + profile_utils.render_badges(new_badges),
-                    color=discord.Color.gold()
+                png = await self.renderer.render(
+                    member.display_name, tile,
+                    xp, msg_count, total_seconds, vitorias, derrotas, badges
                 )
-                await member.send(embed=dm)
-            except discord.Forbidden:
-                pass
-
-        buffer = profile_utils.generate_profile_image(member, xp, msg_count, total_seconds, vitorias, derrotas, badges)
-        file = discord.File(fp=buffer, filename="perfil.png")
+                self.cards.put(guild_id, user_id, card_token, png)
+            except RendererBusy:
+                logging.warning(f"[AVISO] Renderizador de perfis cheio: {self.renderer.stats()}")
+        file = discord.File(fp=io.BytesIO(png), filename="perfil.png") if png else None
 
         def format_time(seconds: int):
             h, r = divmod(seconds, 3600)
@@ -222,7 +328,8 @@ class InteractionCog(commands.Cog):
             timestamp=datetime.datetime.now(datetime.timezone.utc)
         )
         embed.set_thumbnail(url=member.display_avatar.url)
-        embed.set_image(url="attachment://perfil.png")
+        if file:
+            embed.set_image(url="attachment://perfil.png")
         embed.add_field(name="👤 Usuário", value=member.name, inline=True)
         embed.add_field(name="📛 Nickname", value=member.display_name, inline=True)
         embed.add_field(name="✨ XP", value=f"{xp}", inline=True)
@@ -236,7 +343,10 @@ class InteractionCog(commands.Cog):
         embed.add_field(name="⚡ Multiplicador de XP", value=multiplier_text, inline=False)
         embed.add_field(name="🏅 Badges", value=badges_str or "Nenhuma ainda 💤", inline=False)
 
-        await interaction.response.send_message(embed=embed, file=file, ephemeral=True)
+        if file:
+            await interaction.followup.send(embed=embed, file=file, ephemeral=True)
+        else:
+            await interaction.followup.send(embed=embed, ephemeral=True)
 
     @info.autocomplete("user_input")
     async def user_autocomplete(self, interaction: discord.Interaction, current: str):
@@ -263,7 +373,7 @@ class InteractionCog(commands.Cog):
     @app_commands.describe(user="Usuário que receberá a badge")
     @app_commands.checks.has_permissions(administrator=True)
     async def givebadge(self, interaction: Interaction, user: discord.Member):
-        view = GiveBadgeView(user)
+        view = GiveBadgeView(user, self.notifier)
         await interaction.response.send_message(
             f"Selecione a badge que deseja dar para {user.display_name}:",
             view=view,
@@ -276,6 +386,16 @@ class InteractionCog(commands.Cog):
         modal = RemoveBadgeModal(interaction.user, interaction.guild)
         await interaction.response.send_modal(modal)
 
+    @app_commands.command(name="notificacoes", description="Ativa ou desativa as DMs de XP e badges")
+    async def notificacoes(self, interaction: Interaction):
+        opted_out = not self.notifier.is_opted_out(interaction.user.id)
+        await self.notifier.set_optout(interaction.user.id, opted_out)
+        if opted_out:
+            msg = "🔕 Você não vai mais receber DMs de XP e badges. Use /notificacoes de novo para reativar."
+        else:
+            msg = "🔔 DMs de XP e badges reativadas!"
+        await interaction.response.send_message(msg, ephemeral=True)
+
 class RemoveBadgeModal(Modal):
     def __init__(self, admin: discord.Member, guild: discord.Guild):
         super().__init__(title="Remover Badge")
@@ -306,7 +426,7 @@ class RemoveBadgeModal(Modal):
             await interaction.response.send_message("Usuário não encontrado.", ephemeral=True)
             return
 
-        user_badges = [b["badge_key"] for b in db.get_user_badges(member.id, self.guild.id)]
+        user_badges = [b["badge_key"] for b in await db_async.get_user_badges(member.id, self.guild.id)]
         if not user_badges:
             await interaction.response.send_message(f"{member.display_name} não possui badges.", ephemeral=True)
             return
@@ -336,7 +456,7 @@ class RemoveBadgeView(View):
     async def select_callback(self, interaction: Interaction):
         selected = self.select.values
         for badge in selected:
-            db.remove_user_badge(self.member.id, interaction.guild.id, badge)
+            await db_async.remove_user_badge(self.member.id, interaction.guild.id, badge)
 
         await interaction.response.send_message(
             f"As badges {', '.join([profile_utils.BADGE_EMOJIS.get(b,b) for b in selected])} foram removidas de {self.member.display_name} ✅",
@@ -346,9 +466,10 @@ class RemoveBadgeView(View):
         
         
 class GiveBadgeView(View):
-    def __init__(self, target_member: discord.Member):
+    def __init__(self, target_member: discord.Member, notifier: Notifier):
         super().__init__(timeout=60)
         self.target_member = target_member
+        self.notifier = notifier
 
         self.select = Select(
             placeholder="Selecione a badge para conceder",
@@ -364,17 +485,14 @@ class GiveBadgeView(View):
 
     async def select_callback(self, interaction: Interaction):
         badge = self.select.values[0].lower()
-        db.add_user_badge(self.target_member.id, interaction.guild.id, badge)
+        await db_async.add_user_badge(self.target_member.id, interaction.guild.id, badge)
 
-        try:
-            dm = discord.Embed(
-                title="🏅 Nova Badge!",
-                description=f"Você recebeu a badge {profile_utils.BADGE_EMOJIS[badge]}!",
-                color=discord.Color.gold()
-            )
-            await self.target_member.send(embed=dm)
-        except discord.Forbidden:
-            pass
+        self.notifier.notify(
+            self.target_member,
+            "🏅 Nova Badge!",
+            f"Você recebeu a badge {profile_utils.BADGE_EMOJIS[badge]}!",
+            color=discord.Color.gold()
+        )
 
         await interaction.response.send_message(
             f"A badge {profile_utils.BADGE_EMOJIS[badge]} foi concedida a {self.target_member.display_name} ✅",
@@ -1,7 +1,6 @@
 import re
 import asyncio
 import functools
-import time
 from typing import Optional
 from datetime import datetime
 from discord.utils import find, format_dt
@@ -12,8 +11,14 @@ from discord import app_commands
 from discord.ui import View, Button, Modal, Select, TextInput
 
 import db
+import db_async
 from utils.logger import send_log
 
+BOOST_ROLE_NAME = "⚡ BoostXP"
+BOOST_EXPIRY_BATCH = 100
+# remoções de cargo/DMs simultâneas por guild; guilds diferentes andam em paralelo
+BOOST_EXPIRY_CONCURRENCY = 5
+
 
 def log_command(title_getter, fields_getter):
     def decorator(func):
@@ -42,12 +47,12 @@ def generic_fields(self, interaction, *args, **kwargs):
         "📍 Canal": f"{interaction.channel.name if interaction.channel else 'Direto'}"
     }
 
-async def safe_delete(channel: discord.TextChannel, delay: int = 60, reason: str = None):
-    await asyncio.sleep(delay)
-    try:
-        await channel.delete(reason=reason)
-    except Exception:
-        pass
+async def safe_delete(bot, channel: discord.TextChannel, delay: int = 60, reason: str = None):
+    # agendado no bot.scheduler: o canal é apagado mesmo se o bot reiniciar antes
+    await bot.scheduler.schedule(
+        "channel_delete", str(channel.id), delay,
+        {"channel_id": channel.id, "reason": reason}, guild_id=channel.guild.id
+    )
 
 
 class NickModal(discord.ui.Modal, title="✏️ Alterar Apelido"):
@@ -104,7 +109,7 @@ class NickModal(discord.ui.Modal, title="✏️ Alterar Apelido"):
             if self.canal_temp_id:
                 canal_temp = guild.get_channel(self.canal_temp_id)
                 if canal_temp:
-                    asyncio.create_task(safe_delete(canal_temp, delay=60, reason="Conversa de compra encerrada"))
+                    await safe_delete(interaction.client, canal_temp, delay=60, reason="Conversa de compra encerrada")
 
             print(f"[INFO] Nick antes: {before_nick} → depois: {novo_nick}")
 
@@ -128,12 +133,12 @@ class ConfirmarCompraView(discord.ui.View):
 
         guild = interaction.guild
 
-        xp = db.get_user_data(self.user.id, guild.id)[0]
+        xp = (await db_async.get_user_data(self.user.id, guild.id))[0]
         if xp < self.preco:
             return await interaction.response.send_message("❌ XP insuficiente.", ephemeral=True)
 
         novo_xp = max(0, xp - self.preco)
-        db.update_xp(self.user.id, guild.id, novo_xp)
+        await db_async.update_xp(self.user.id, guild.id, novo_xp)
 
         if self.selecionado == "nick":
             try:
@@ -252,10 +257,10 @@ class ConfirmarCompraView(discord.ui.View):
             multiplier = 1.5
             duration = 24 * 60 * 60
 
-            db.set_boost_xp(self.user.id, guild.id, multiplier, duration)
+            expires_at = db.set_boost_xp(self.user.id, guild.id, multiplier, duration)
 
 
-            role_name = "⚡ BoostXP"
+            role_name = BOOST_ROLE_NAME
             role = discord.utils.get(guild.roles, name=role_name)
 
 
@@ -280,9 +285,12 @@ class ConfirmarCompraView(discord.ui.View):
                     print(f"[ERRO] Não foi possível atribuir o cargo BoostXP: {e}")
 
 
-            asyncio.create_task(self._schedule_boost_end(interaction.client, self.user, guild, duration, role_name="⚡ BoostXP"))
+            # mesmo prazo da linha em boost_xp, para o job e o boost_checker concordarem
+            await interaction.client.scheduler.schedule_at(
+                "boost_end", f"{guild.id}:{self.user.id}", expires_at,
+                {"guild_id": guild.id, "user_id": self.user.id}, guild_id=guild.id
+            )
 
-            expires_at = int(time.time()) + duration
             rel = format_dt(datetime.fromtimestamp(expires_at), style="R")
             abs_time = format_dt(datetime.fromtimestamp(expires_at), style="f")
 
@@ -299,7 +307,7 @@ class ConfirmarCompraView(discord.ui.View):
 
             await interaction.edit_original_response(embed=embed, view=FecharView())
             if self.canal_temp:
-                asyncio.create_task(safe_delete(self.canal_temp, delay=300, reason="Conversa de compra encerrada (boost aplicado)"))
+                await safe_delete(interaction.client, self.canal_temp, delay=300, reason="Conversa de compra encerrada (boost aplicado)")
             return
 
  
@@ -315,37 +323,12 @@ class ConfirmarCompraView(discord.ui.View):
 
         try:
             if self.canal_temp:
-                asyncio.create_task(safe_delete(self.canal_temp, delay=300, reason="Compra cancelada pelo usuário"))
+                await safe_delete(interaction.client, self.canal_temp, delay=300, reason="Compra cancelada pelo usuário")
 
         except Exception:
             pass
-        
 
 
-    async def _schedule_boost_end(self, bot, user: discord.Member, guild: discord.Guild, delay: int, role_name: str = "⚡ BoostXP"):
-        await asyncio.sleep(delay)
-
-        try:
-            db.remove_boost(user.id, guild.id)
-        except Exception:
-            pass
-
-        member = guild.get_member(user.id)
-        if not member:
-            return
-
-        role = discord.utils.get(guild.roles, name=role_name)
-        if role and role in member.roles:
-            try:
-                await member.remove_roles(role, reason="Boost expirado")
-            except Exception as e:
-                print(f"[ERRO] Falha ao remover cargo BoostXP: {e}")
-
-        try:
-            await user.send("⏰ Seu **Boost de XP** terminou! ⚡")
-        except Exception:
-            pass
-
 class FecharView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -569,55 +552,107 @@ class CfgColor(discord.ui.Modal, title="🎨 Alterar cor do cargo VIP"):
 class Loja(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        bot.scheduler.register("boost_end", self.end_boost)
+        bot.scheduler.register("channel_delete", self.delete_temp_channel)
 
         self.boost_checker.start()
 
     def cog_unload(self):
         self.boost_checker.cancel()
 
-    @tasks.loop(minutes=1)
-    async def boost_checker(self):
-
-
-        try:
-            expired = []
-            if hasattr(db, "get_boosts_expired"):
-                expired = db.get_boosts_expired()
-            else:
-                return 
-            for user_id, guild_id in expired:
+    async def end_boost(self, payload: dict):
+        guild_id, user_id = payload["guild_id"], payload["user_id"]
+        # sem linha removida, o boost_checker (ou uma tentativa anterior deste job)
+        # já cuidou do boost: só a remoção do cargo é refeita, sem DM de novo
+        claimed = bool(await db_async.remove_boosts([(user_id, guild_id)]))
+
+        guild = self.bot.get_guild(guild_id)
+        if guild:
+            errors = await self._expire_guild_boosts(guild, [user_id], notify=claimed)
+            if errors:
+                raise errors[0]  # o scheduler tenta de novo com backoff
+
+    async def _expire_member_boost(self, member: discord.Member, semaphore: asyncio.Semaphore, notify: bool):
+        # boost renovado nesse meio tempo: o cargo fica
+        if db.check_boost_active(member.id, member.guild.id):
+            return
+        async with semaphore:
+            error = None
+            roles = [r for r in member.roles if r.name.startswith(BOOST_ROLE_NAME)]
+            if roles:
                 try:
-                    db.remove_boost(user_id, guild_id)
-                except Exception:
-                    pass
+                    await member.remove_roles(*roles, reason="Boost expirado")
+                except Exception as e:
+                    error = e
 
-                guild = self.bot.get_guild(guild_id)
-                if not guild:
-                    continue
-                member = guild.get_member(user_id)
-                if not member:
-                    continue
+            # a DM sai uma vez só, mesmo se o cargo falhar e o job for refeito
+            if notify:
                 try:
-                    for r in list(member.roles):
-                        if r.name.startswith("⚡ BoostXP"):
-                            try:
-                                await member.remove_roles(r, reason="Boost expirado")
-                                try:
-                                    await r.delete(reason="Boost expirado")
-                                except Exception:
-                                    pass
-                            except Exception:
-                                pass
+                    await member.send("⏰ Seu **Boost de XP** terminou! Esperamos que tenha aproveitado o bônus. ⚡")
                 except Exception:
                     pass
-
+            if error:
+                raise error
+
+    async def _expire_guild_boosts(self, guild: discord.Guild, user_ids, notify: bool = True):
+        # devolve as falhas ao remover cargos
+        semaphore = asyncio.Semaphore(BOOST_EXPIRY_CONCURRENCY)
+        members = [m for m in map(guild.get_member, user_ids) if m]
+        results = await asyncio.gather(
+            *(self._expire_member_boost(m, semaphore, notify) for m in members), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        for e in errors:
+            print(f"[ERRO] Falha ao remover cargo BoostXP: {e}")
+
+        # o cargo é um só para a guild: só é apagado quando nenhum dono ainda tem
+        # boost ativo (role.members pode listar quem acabou de perder o cargo)
+        for role in [r for r in guild.roles if r.name.startswith(BOOST_ROLE_NAME)]:
+            if not any(db.check_boost_active(m.id, guild.id) for m in role.members):
                 try:
-                    await member.send("⏰ Seu **Boost de XP** terminou! Esperamos que tenha aproveitado o bônus. ⚡")
+                    await role.delete(reason="Boost expirado")
                 except Exception:
                     pass
+        return errors
+
+    async def delete_temp_channel(self, payload: dict):
+        channel = self.bot.get_channel(payload["channel_id"])
+        if channel is None:
+            return
+        try:
+            await channel.delete(reason=payload.get("reason"))
         except Exception:
             pass
 
+    @tasks.loop(minutes=1)
+    async def boost_checker(self):
+        # varre o que o job boost_end não pegou (boosts antigos, falhas), em lotes
+        try:
+            while True:
+                expired = await db_async.get_boosts_expired(BOOST_EXPIRY_BATCH)
+                if not expired:
+                    break
+                removed = await db_async.remove_boosts(expired)
+
+                by_guild = {}
+                for user_id, guild_id in removed:
+                    by_guild.setdefault(guild_id, []).append(user_id)
+                    await self.bot.scheduler.cancel("boost_end", f"{guild_id}:{user_id}")
+                await asyncio.gather(*(
+                    self._expire_guild_boosts(guild, user_ids)
+                    for guild_id, user_ids in by_guild.items()
+                    if (guild := self.bot.get_guild(guild_id))
+                ))
+
+                if len(expired) < BOOST_EXPIRY_BATCH:
+                    break
+        except Exception as e:
+            print(f"[ERRO] boost_checker: {e}")
+
+    @boost_checker.before_loop
+    async def before_boost_checker(self):
+        await self.bot.wait_until_ready()
+
     # comandos
     @app_commands.command(name='nwitem', description='Adiciona um novo item à loja')
     @log_command(generic_title, generic_fields)
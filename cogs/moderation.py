@@ -2,8 +2,8 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from typing import Callable, Awaitable
-import asyncio
 import db
+from utils.log_channels import log_channels
 
 
 
@@ -114,13 +114,12 @@ class Moderation(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.log_channel_name = "logs-punições"
+        bot.scheduler.register("unmute", self.remover_mute)
         
     async def get_or_create_log_channel(self, guild: discord.Guild)-> discord.TextChannel:
-        
-        channel = discord.utils.get(guild.text_channels, name = self.log_channel_name)
-        if channel:
-            return channel
-        
+        return await log_channels.resolve(guild, self.log_channel_name, create=self._create_log_channel)
+
+    async def _create_log_channel(self, guild: discord.Guild) -> discord.TextChannel:
         overwrites = {
             guild.default_role: discord.PermissionOverwrite(view_channel=False),
         }
@@ -224,7 +223,6 @@ class Moderation(commands.Cog):
 
             if tipo == "chat":
                 await member.add_roles(role, reason=f"Mute de chat por {duration} min")
-                asyncio.create_task(self.remover_mute_chat(interaction.guild, member, role, duration))
             else:
                 if not member.voice:
                     return discord.Embed(
@@ -235,7 +233,13 @@ class Moderation(commands.Cog):
                 if role not in member.roles:
                     await member.add_roles(role, reason=f"Mute de voz por {duration} min")
                 await member.edit(mute=True, reason=f"Mute de voz por {duration} min")
-                asyncio.create_task(self.remover_mute_voz(member, role, duration, tipo))
+
+            # um mute novo para o mesmo membro substitui o timer anterior
+            await self.bot.scheduler.schedule(
+                "unmute", f"{interaction.guild.id}:{member.id}", duration * 60,
+                {"guild_id": interaction.guild.id, "user_id": member.id, "role_id": role.id, "tipo": tipo},
+                guild_id=interaction.guild.id
+            )
 
             db.add_punishment(
                 member.id, interaction.guild.id, interaction.user.id,
@@ -272,38 +276,28 @@ class Moderation(commands.Cog):
         await interaction.response.send_message(embed=confirm, view=view, ephemeral=True)
 
 
-    async def remover_mute_chat(self, guild, member, role, duration):
-        await asyncio.sleep(duration * 60)
-        try:
-            member = await guild.fetch_member(member.id)
-            if role in member.roles:
-                await member.remove_roles(role, reason="Mute expirado")
-
-            un = discord.Embed(
-                title="🔊 Você foi desmutado",
-                description=f"Seu mute no servidor **{guild.name}** foi retirado.",
-                color=discord.Color.green()
-            )
-            await _safe_dm(member, un)
-        except Exception as e:
-            print(f"Erro ao remover mute chat: {e}")
-            
-            
-    async def remover_mute_voz(self, member, role, duration, tipo):
-        await asyncio.sleep(duration * 60)
+    # handler do job "unmute" do bot.scheduler (chat e call)
+    async def remover_mute(self, payload: dict):
+        guild = self.bot.get_guild(payload["guild_id"])
+        if not guild:
+            return
+        # outras falhas sobem: o scheduler mantém o job e tenta de novo com backoff
         try:
-            if role in member.roles:
-                await member.remove_roles(role, reason="Mute expirado")
-            if tipo == "call" and member.voice:
-                await member.edit(mute=False, reason="Mute expirado")
-            un = discord.Embed(
-                title="🔊 Você foi desmutado",
-                description=f"Seu mute no servidor foi retirado.",
-                color=discord.Color.green()
-            )
-            await _safe_dm(member, un)
-        except Exception:
-            pass
+            member = guild.get_member(payload["user_id"]) or await guild.fetch_member(payload["user_id"])
+        except discord.NotFound:
+            return  # saiu do servidor
+        role = guild.get_role(payload["role_id"])
+        if role and role in member.roles:
+            await member.remove_roles(role, reason="Mute expirado")
+        if payload["tipo"] == "call" and member.voice:
+            await member.edit(mute=False, reason="Mute expirado")
+
+        un = discord.Embed(
+            title="🔊 Você foi desmutado",
+            description=f"Seu mute no servidor **{guild.name}** foi retirado.",
+            color=discord.Color.green()
+        )
+        await _safe_dm(member, un)
 
     @app_commands.command(name="ban", description="Bane um usuário com confirmação e DM (prova obrigatória: imagem/vídeo).")
     @app_commands.describe(
@@ -2,14 +2,62 @@ import sqlite3
 import datetime
 import time
 import random
-import sys
 import json
+import threading
+import itertools
+import functools
 from utils import profile_utils
+from utils.leaderboard import GuildLeaderboard
+from utils.boosts import BoostRegistry
+
+DB_PATH = 'ranking.db'
+
+
+def _connect(path: str = DB_PATH, readonly: bool = False) -> sqlite3.Connection:
+    # WAL deixa leitores e o writer trabalharem juntos; synchronous=NORMAL só
+    # faz fsync no checkpoint, o que em WAL continua seguro contra corrupção.
+    connection = sqlite3.connect(path, check_same_thread=False, timeout=10)
+    if not readonly:
+        connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA cache_size=-16000')
+    connection.execute('PRAGMA mmap_size=134217728')
+    connection.execute('PRAGMA temp_store=MEMORY')
+    if readonly:
+        connection.execute('PRAGMA query_only=ON')
+    connection.create_function(
+        'calc_level', 1, lambda xp: profile_utils.calculate_level(xp)["level"], deterministic=True
+    )
+    return connection
+
+
+# a conexão de escrita só abre no init_db(): os workers do render_service
+# (spawn) reimportam o main.py, e com ele este módulo, sem tocar no banco
+conn = None
+cursor = None
+lock = threading.RLock()
+
+# cada thread que lê (o pool de leitura do db_async, o event loop) ganha a sua
+# conexão somente leitura, então ranking e perfil não esperam as escritas de XP
+_readers = threading.local()
+
+
+def _reader() -> sqlite3.Cursor:
+    reader = getattr(_readers, "cursor", None)
+    if reader is None:
+        reader = _readers.cursor = _connect(readonly=True).cursor()
+    return reader
+
+
+RANKING_COLUMNS = {"xp": "xp", "vitorias": "vitorias", "derrotas": "derrotas"}
 
-conn = sqlite3.connect('ranking.db')
-cursor = conn.cursor()
 
 def init_db():
+    global conn, cursor
+    if conn is None:
+        conn = _connect()
+        cursor = conn.cursor()
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             user_id INTEGER,
@@ -21,7 +69,52 @@ def init_db():
             PRIMARY KEY(user_id, guild_id)
         )
     ''')
+    # índices do ranking (categoria DESC, user_id como desempate); o de XP também
+    # serve o carregamento do leaderboard em memória, que já vem quase ordenado
+    for column in RANKING_COLUMNS.values():
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_users_guild_{column}
+            ON users (guild_id, {column} DESC, user_id)
+        ''')
     
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bot_meta(
+            key TEXT PRIMARY KEY,
+            value TEXT
+            )
+        ''')
+
+    # timers persistentes do utils.scheduler (fim de boost, fim de mute, canal temporário)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scheduled_jobs(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            job_key TEXT NOT NULL,
+            guild_id INTEGER,
+            expires_at REAL NOT NULL,
+            payload TEXT NOT NULL,
+            UNIQUE(kind, job_key)
+            )
+        ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_scheduled_jobs_expires_at ON scheduled_jobs (expires_at)')
+
+    # canal de log escolhido por guild e nome (utils.log_channels)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS log_channels(
+            guild_id INTEGER,
+            name TEXT,
+            channel_id INTEGER NOT NULL,
+            PRIMARY KEY(guild_id, name)
+            )
+        ''')
+
+    # quem desligou as DMs de XP/badges (/notificacoes); vale para todas as guilds
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS dm_optout(
+            user_id INTEGER PRIMARY KEY
+            )
+        ''')
+
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS guilds(
             guild_id INTEGER PRIMARY KEY,
@@ -67,6 +160,17 @@ def init_db():
             PRIMARY KEY(user_id, guild_id)
         )
     ''')
+    # sessões de voz abertas: accounted_at é até onde o tempo já foi para call_time,
+    # seen_at é o último checkpoint (usado para limitar a sessão depois de um crash)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS voice_sessions (
+            guild_id INTEGER,
+            user_id INTEGER,
+            accounted_at REAL NOT NULL,
+            seen_at REAL NOT NULL,
+            PRIMARY KEY(guild_id, user_id)
+        )
+    ''')
     conn.commit()
     
     cursor.execute('''
@@ -93,6 +197,7 @@ def init_db():
             PRIMARY KEY (user_id, guild_id)
         )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_boost_xp_expires_at ON boost_xp (expires_at)')
     conn.commit()
      
     cursor.execute('''
@@ -143,69 +248,321 @@ def init_db():
 ''')
     conn.commit()
 
+    # boosts ativos carregados aqui, no startup: a primeira leitura vem de
+    # on_message, sem lock, e não pode esperar uma escrita longa para carregar
+    _boost_registry()
+
 
 # XP INCREMENT
 def add_xp(user_id: int, guild_id: int, amount: int):
-    ensure_user_exists(user_id, guild_id) 
+    try:
+        with conn:
+            result = _apply_xp(user_id, guild_id, amount)
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, xp=result["new_xp"])
+        return result
+
+    except sqlite3.Error as e:
+        print(f"[ERRO] Falha ao adicionar XP ao usuário {user_id}: {e}")
+        return False
+
+
+def _apply_xp(user_id: int, guild_id: int, amount: int, check_badges: bool = False):
+    # sem commit: quem chama controla a transação (add_xp ou flush_pending).
+    # O upsert incrementa o XP e devolve só o XP novo; mensagens, call e badges
+    # só são lidos quando o XP cruza um limite de BADGE_THRESHOLDS (ou quando o
+    # flush avisa que as mensagens cruzaram, via check_badges).
+    cursor.execute('''
+        INSERT INTO users (user_id, guild_id, xp, level)
+        VALUES (:user_id, :guild_id, :amount, calc_level(:amount))
+        ON CONFLICT(user_id, guild_id) DO UPDATE SET
+            xp = xp + excluded.xp,
+            level = calc_level(xp + excluded.xp)
+        RETURNING xp
+    ''', {"user_id": user_id, "guild_id": guild_id, "amount": amount})
+    new_xp = cursor.fetchall()[0][0]
+    old_xp = new_xp - amount
+
+    old_level = profile_utils.calculate_level(old_xp)["level"]
+    new_level = profile_utils.calculate_level(new_xp)["level"]
+
+    new_badges = []
+    if check_badges or profile_utils.crosses_badge_threshold("xp", old_xp, new_xp):
+        new_badges = _award_badges(user_id, guild_id)
+
+    return {
+        "old_xp": old_xp,
+        "new_xp": new_xp,
+        "old_level": old_level,
+        "new_level": new_level,
+        "leveled_up": new_level > old_level,
+        "new_badges": new_badges
+    }
+
+
+def _award_badges(user_id: int, guild_id: int):
+    # sem commit, como _apply_xp; lê o estado da própria transação
+    params = {"user_id": user_id, "guild_id": guild_id}
+    cursor.execute('''
+        SELECT
+            (SELECT xp FROM users WHERE user_id = :user_id AND guild_id = :guild_id),
+            (SELECT count FROM messages WHERE user_id = :user_id AND guild_id = :guild_id),
+            (SELECT seconds FROM call_time WHERE user_id = :user_id AND guild_id = :guild_id),
+            (SELECT group_concat(badge_key) FROM user_badges WHERE user_id = :user_id AND guild_id = :guild_id)
+    ''', params)
+    xp, mensagens, call_seconds, held = cursor.fetchone()
+
+    with _pending_lock:
+        mensagens = (mensagens or 0) + _pending_amount((user_id, guild_id), _pending_messages)
+
+    new_badges = profile_utils.badges_earned(
+        held.split(",") if held else [], xp or 0, mensagens, call_seconds or 0
+    )
+    if new_badges:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO user_badges (user_id, guild_id, badge_key) VALUES (?, ?, ?)",
+            [(user_id, guild_id, key) for key in new_badges]
+        )
+    return new_badges
+
+
+# STATS VERSIONS
+# Cada escrita que muda o que aparece no card de perfil (XP, mensagens, call,
+# vitórias/derrotas, badges) troca a versão do usuário, depois do commit.
+# O card_cache usa get_stats_version() na chave para saber quando re-renderizar.
+# next() do itertools.count é atômico, então não precisa de lock.
+
+_version_counter = itertools.count(1)
+_stats_versions = {}
+_guild_versions = {}
+_global_version = [0]
+
 
+def _touch(user_id, guild_id):
+    _stats_versions[(user_id, guild_id)] = next(_version_counter)
+
+
+def _touch_guild(guild_id):
+    _guild_versions[guild_id] = next(_version_counter)
+
+
+def _touch_all():
+    _global_version[0] = next(_version_counter)
+
+
+def get_stats_version(user_id: int, guild_id: int):
+    return (
+        _global_version[0],
+        _guild_versions.get(guild_id, 0),
+        _stats_versions.get((user_id, guild_id), 0)
+    )
+
+
+def add_xp_bulk(grants):
+    # várias concessões de XP ([(user_id, guild_id, amount)]) numa transação só:
+    # um SELECT busca o estado de todos, um executemany aplica o XP e outro as badges.
+    # Devolve {(user_id, guild_id): resultado no mesmo formato do add_xp}.
+    amounts = {}
+    for user_id, guild_id, amount in grants:
+        amounts[(user_id, guild_id)] = amounts.get((user_id, guild_id), 0) + amount
+    if not amounts:
+        return {}
+
+    keys = json.dumps([[user_id, guild_id] for user_id, guild_id in amounts])
     try:
+        with conn:
+            cursor.execute('''
+                WITH grants(user_id, guild_id) AS (
+                    SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+                )
+                SELECT
+                    g.user_id, g.guild_id, u.xp, m.count, c.seconds,
+                    (SELECT group_concat(badge_key) FROM user_badges b
+                     WHERE b.user_id = g.user_id AND b.guild_id = g.guild_id)
+                FROM grants g
+                LEFT JOIN users u ON u.user_id = g.user_id AND u.guild_id = g.guild_id
+                LEFT JOIN messages m ON m.user_id = g.user_id AND m.guild_id = g.guild_id
+                LEFT JOIN call_time c ON c.user_id = g.user_id AND c.guild_id = g.guild_id
+            ''', (keys,))
+            current = {(row[0], row[1]): row[2:] for row in cursor.fetchall()}
+
+            cursor.executemany('''
+                INSERT INTO users (user_id, guild_id, xp, level)
+                VALUES (?, ?, ?, calc_level(?))
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                    xp = xp + excluded.xp,
+                    level = calc_level(xp + excluded.xp)
+            ''', [(user_id, guild_id, amount, amount) for (user_id, guild_id), amount in amounts.items()])
+
+            results, badge_rows = {}, []
+            with _pending_lock:
+                pending_messages = {key: _pending_amount(key, _pending_messages) for key in amounts}
+            for key, amount in amounts.items():
+                old_xp, mensagens, call_seconds, held = current[key]
+                old_xp = old_xp or 0
+                new_xp = old_xp + amount
+                old_level = profile_utils.calculate_level(old_xp)["level"]
+                new_level = profile_utils.calculate_level(new_xp)["level"]
+                new_badges = profile_utils.badges_earned(
+                    held.split(",") if held else [], new_xp,
+                    (mensagens or 0) + pending_messages[key], call_seconds or 0
+                )
+                badge_rows.extend((*key, badge) for badge in new_badges)
+                results[key] = {
+                    "old_xp": old_xp,
+                    "new_xp": new_xp,
+                    "old_level": old_level,
+                    "new_level": new_level,
+                    "leveled_up": new_level > old_level,
+                    "new_badges": new_badges
+                }
+
+            cursor.executemany(
+                "INSERT OR IGNORE INTO user_badges (user_id, guild_id, badge_key) VALUES (?, ?, ?)",
+                badge_rows
+            )
+    except sqlite3.Error as e:
+        print(f"[ERRO] Falha ao adicionar XP em lote: {e}")
+        return {}
 
-        cursor.execute('SELECT xp FROM users WHERE user_id=? AND guild_id=?', (user_id, guild_id))
-        row = cursor.fetchone()
-        if not row:
-            print(f"[WARN] Usuário {user_id} não encontrado na guild {guild_id}.")
-            return False
+    for (user_id, guild_id), result in results.items():
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, xp=result["new_xp"])
+    return results
 
-        old_xp = row[0]
-        new_xp = old_xp + amount
 
+# WRITE-BEHIND BUFFER
+# on_message acumula mensagens e XP aqui; flush_pending() grava tudo numa única
+# transação. As leituras somam os deltas pendentes ao que está no banco.
+# Os deltas em gravação ficam em _flushing_* até o commit. O _pending_lock só
+# protege os dicts (on_message o pega no event loop), nunca I/O do SQLite: o
+# flush deixa _flush_seq ímpar durante o commit e só volta a par depois de limpar
+# _flushing_*; o leitor (_read_with_pending) refaz a leitura se a sequência mudou
+# no meio, assim um delta nunca é contado duas vezes nem esquecido.
 
-        cursor.execute('SELECT count FROM messages WHERE user_id=? AND guild_id=?', (user_id, guild_id))
-        msg_row = cursor.fetchone()
-        mensagens = msg_row[0] if msg_row else 0
+WRITE_BEHIND_MAX_PENDING = 500
+# linhas por INSERT multi-VALUES no flush (3 parâmetros cada, abaixo de 999)
+WRITE_BEHIND_CHUNK_ROWS = 300
 
-        cursor.execute('SELECT seconds FROM call_time WHERE user_id=? AND guild_id=?', (user_id, guild_id))
-        call_row = cursor.fetchone()
-        call_seconds = call_row[0] if call_row else 0
+_pending_lock = threading.Lock()
+_pending_messages = {}
+_pending_xp = {}
+_flushing_messages = {}
+_flushing_xp = {}
+_flush_seq = 0
 
 
-        old_level = profile_utils.calculate_level(old_xp)["level"]
-        new_level = profile_utils.calculate_level(new_xp)["level"]
+def _buffer(pending: dict, user_id: int, guild_id: int, amount: int) -> bool:
+    key = (user_id, guild_id)
+    with _pending_lock:
+        pending[key] = pending.get(key, 0) + amount
+        full = len(_pending_messages) + len(_pending_xp) >= WRITE_BEHIND_MAX_PENDING
+    _touch(user_id, guild_id)
+    return full
 
 
-        cursor.execute('''
-            UPDATE users
-            SET xp = ?, level = ?
-            WHERE user_id = ? AND guild_id = ?
-        ''', (new_xp, new_level, user_id, guild_id))
-        conn.commit()
+# retornam True quando o buffer já está grande o bastante para um flush imediato
+def buffer_message(user_id: int, guild_id: int, amount: int = 1) -> bool:
+    return _buffer(_pending_messages, user_id, guild_id, amount)
 
 
-        new_badges = profile_utils.check_and_award_badges(
-            db=sys.modules[__name__], 
-            user_id=user_id,
-            guild_id=guild_id,
-            xp=new_xp,
-            messages=mensagens,
-            call_seconds=call_seconds
-        )
+def buffer_xp(user_id: int, guild_id: int, amount: int) -> bool:
+    return _buffer(_pending_xp, user_id, guild_id, amount)
 
-        result = {
-            "old_xp": old_xp,
-            "new_xp": new_xp,
-            "old_level": old_level,
-            "new_level": new_level,
-            "leveled_up": new_level > old_level,
-            "new_badges": new_badges
-        }
 
-        return result
+def _pending_amount(key, *buffers) -> int:
+    # chamar com o _pending_lock adquirido
+    return sum(buffer.get(key, 0) for buffer in buffers)
+
+
+def _read_with_pending(key, buffers, query):
+    # query() roda fora do _pending_lock; devolve (resultado, delta pendente)
+    while True:
+        with _pending_lock:
+            seq = _flush_seq
+            pending = _pending_amount(key, *buffers)
+        if seq % 2:
+            time.sleep(0.001)  # commit do flush em andamento
+            continue
+        result = query()
+        with _pending_lock:
+            if _flush_seq == seq:
+                return result, pending
+
+
+def _begin_commit():
+    global _flush_seq
+    with _pending_lock:
+        _flush_seq += 1
+
 
+def _end_commit(committed: bool):
+    global _flush_seq
+    with _pending_lock:
+        if committed:
+            _flushing_messages.clear()
+            _flushing_xp.clear()
+        _flush_seq += 1
+
+
+def flush_pending():
+    with _pending_lock:
+        _flushing_messages.update(_pending_messages)
+        _flushing_xp.update(_pending_xp)
+        _pending_messages.clear()
+        _pending_xp.clear()
+        messages = _flushing_messages.copy()
+        xp = _flushing_xp.copy()
+
+    if not messages and not xp:
+        return 0
+
+    try:
+        # o upsert devolve a contagem nova: as badges só são reavaliadas para
+        # quem cruzou um limite de mensagens
+        crossed = set()
+        rows = list(messages.items())
+        for start in range(0, len(rows), WRITE_BEHIND_CHUNK_ROWS):
+            chunk = rows[start:start + WRITE_BEHIND_CHUNK_ROWS]
+            cursor.execute(f'''
+                INSERT INTO messages (user_id, guild_id, count)
+                VALUES {", ".join(["(?, ?, ?)"] * len(chunk))}
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                    count = count + excluded.count
+                RETURNING user_id, guild_id, count
+            ''', [value for (user_id, guild_id), amount in chunk for value in (user_id, guild_id, amount)])
+            for user_id, guild_id, count in cursor.fetchall():
+                key = (user_id, guild_id)
+                if profile_utils.crosses_badge_threshold("messages", count - messages[key], count):
+                    crossed.add(key)
+        results = {key: _apply_xp(*key, amount, key in crossed) for key, amount in xp.items()}
+        awarded = [key for key in crossed if key not in xp and _award_badges(*key)]
+        committed = False
+        _begin_commit()
+        try:
+            conn.commit()
+            committed = True
+        finally:
+            _end_commit(committed)
+        # o XP já estava visível via buffer, mas o flush pode ter dado badges
+        for (user_id, guild_id), result in results.items():
+            _touch(user_id, guild_id)
+            _leaderboard_update(guild_id, user_id, xp=result["new_xp"])
+        for user_id, guild_id in awarded:
+            _touch(user_id, guild_id)
     except sqlite3.Error as e:
-        print(f"[ERRO] Falha ao adicionar XP ao usuário {user_id}: {e}")
-        return False
-    
-    
+        conn.rollback()
+        with _pending_lock:
+            for pending, flushing in ((_pending_messages, _flushing_messages), (_pending_xp, _flushing_xp)):
+                for key, amount in flushing.items():
+                    pending[key] = pending.get(key, 0) + amount
+                flushing.clear()
+        print(f"[ERRO] Falha ao gravar buffer de mensagens/XP: {e}")
+        return 0
+
+    return len(messages) + len(xp)
+
+
 # EXISTENCE CHECKERS
 
 def user_exists(user_id, guild_id):
@@ -220,27 +577,60 @@ def ensure_user_exists(user_id, guild_id):
     if not user_exists(user_id, guild_id):
         set_user_data(user_id, guild_id, 0, 0, 0)
 
+def ensure_users_exist(guild_id, member_ids):
+    # cadastro em lote: compara com quem já está no banco e insere só os novos,
+    # numa transação só. Devolve a lista de ids cadastrados.
+    cursor.execute('SELECT user_id FROM users WHERE guild_id = ?', (guild_id,))
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [user_id for user_id in dict.fromkeys(member_ids) if user_id not in existing]
+    if not missing:
+        return []
+    try:
+        with conn:
+            cursor.executemany(
+                'INSERT OR IGNORE INTO users (user_id, guild_id, xp, vitorias, derrotas) VALUES (?, ?, 0, 0, 0)',
+                [(user_id, guild_id) for user_id in missing]
+            )
+    except sqlite3.Error as e:
+        print(f"[ERRO] Falha ao cadastrar membros do servidor {guild_id}: {e}")
+        return []
+    for user_id in missing:
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, xp=0, vitorias=0, derrotas=0)
+    return missing
+
 def set_user_data(user_id, guild_id, xp, vitorias, derrotas):
+    flush_pending()
+    level = profile_utils.calculate_level(xp)["level"]
     cursor.execute('''
-        INSERT INTO users (user_id, guild_id, xp, vitorias, derrotas)
-        VALUES (?, ?, ?, ?, ?)
+        INSERT INTO users (user_id, guild_id, xp, level, vitorias, derrotas)
+        VALUES (?, ?, ?, ?, ?, ?)
         ON CONFLICT(user_id, guild_id) DO UPDATE SET
             xp = excluded.xp,
+            level = excluded.level,
             vitorias = excluded.vitorias,
             derrotas = excluded.derrotas;
-    ''', (user_id, guild_id, xp, vitorias, derrotas))
+    ''', (user_id, guild_id, xp, level, vitorias, derrotas))
     conn.commit()
+    _touch(user_id, guild_id)
+    _leaderboard_update(guild_id, user_id, xp=xp, vitorias=vitorias, derrotas=derrotas)
 
 # UPDATE FUNCTIONS DATABASE
 
 def clear_user_data(user_id, guild_id):
+    flush_pending()
     cursor.execute('''
-        UPDATE users SET xp = 0, vitorias = 0, derrotas = 0
+        UPDATE users SET xp = 0, level = 0, vitorias = 0, derrotas = 0
         WHERE user_id = ? AND guild_id = ?
     ''', (user_id, guild_id))
+    updated = cursor.rowcount
     conn.commit()
+    _touch(user_id, guild_id)
+    if updated:
+        _leaderboard_update(guild_id, user_id, xp=0, vitorias=0, derrotas=0)
 
 def update_user_data(user_id, guild_id, xp, vitorias, derrotas):
+    flush_pending()
     try:
         level = profile_utils.calculate_level(xp)["level"]
 
@@ -253,10 +643,15 @@ def update_user_data(user_id, guild_id, xp, vitorias, derrotas):
                     derrotas = ?
                 WHERE user_id = ? AND guild_id = ?
             ''', (xp, level, vitorias, derrotas, user_id, guild_id))
+            updated = cursor.rowcount
+        _touch(user_id, guild_id)
+        if updated:
+            _leaderboard_update(guild_id, user_id, xp=xp, vitorias=vitorias, derrotas=derrotas)
     except sqlite3.Error as e:
         print(f"[ERRO] Failed to update user data {user_id}: {e}")
         
 def update_xp(user_id, guild_id, xp):
+    flush_pending()
     if not user_exists(user_id, guild_id):
         print(f"[AVISO] Usuário {user_id} não encontrado")
         return None
@@ -265,11 +660,38 @@ def update_xp(user_id, guild_id, xp):
         cursor.execute('UPDATE users SET xp = ?, level = ? WHERE user_id = ? AND guild_id = ?', 
                        (xp, level, user_id, guild_id))
         conn.commit()
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, xp=xp)
         return True
     except sqlite3.Error as e:
         print(f"[ERRO] Falha ao atualizar XP do usuário {user_id}: {e}")
         return None
 
+# manutenção, fora do boot: as escritas de XP já gravam o level; isto só
+# corrige bancos antigos. python -c "import db; db.init_db(); db.recalculate_levels()"
+def recalculate_levels(guild_id=None):
+    if guild_id is None:
+        cursor.execute('SELECT user_id, guild_id, xp, level FROM users')
+    else:
+        cursor.execute('SELECT user_id, guild_id, xp, level FROM users WHERE guild_id = ?', (guild_id,))
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+
+    levels = profile_utils.calculate_levels([row[2] for row in rows])
+    changed = [
+        (int(level), user_id, row_guild_id)
+        for (user_id, row_guild_id, _, old_level), level in zip(rows, levels)
+        if level != old_level
+    ]
+    cursor.executemany('UPDATE users SET level = ? WHERE user_id = ? AND guild_id = ?', changed)
+    conn.commit()
+    if guild_id is None:
+        _touch_all()
+    else:
+        _touch_guild(guild_id)
+    return len(changed)
+
 def update_vitorias(user_id, guild_id, vitorias):
     if not user_exists(user_id, guild_id):
         print(f"[AVISO] Usuário {user_id} não encontrado")
@@ -277,6 +699,8 @@ def update_vitorias(user_id, guild_id, vitorias):
     try:
         cursor.execute('UPDATE users SET vitorias = ? WHERE user_id = ? AND guild_id = ?', (vitorias, user_id, guild_id))
         conn.commit()
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, vitorias=vitorias)
         return True
     except sqlite3.Error as e:
         print(f"[ERRO] Falha ao atualizar vitórias do usuário {user_id}: {e}")
@@ -289,6 +713,8 @@ def update_derrotas(user_id, guild_id, derrotas):
     try:
         cursor.execute('UPDATE users SET derrotas = ? WHERE user_id = ? AND guild_id = ?', (derrotas, user_id, guild_id))
         conn.commit()
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, derrotas=derrotas)
         return True
     except sqlite3.Error as e:
         print(f"[ERRO] Falha ao atualizar derrotas do usuário {user_id}: {e}")
@@ -302,34 +728,212 @@ def update_guild_name(guild_id: int, guild_name: str):
     ''', (guild_id, guild_name))
     conn.commit()
 
+# BOT META
+# pares chave/valor do próprio bot (ex.: hash da árvore de slash commands)
+
+def get_meta(key: str):
+    cursor.execute('SELECT value FROM bot_meta WHERE key = ?', (key,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def set_meta(key: str, value: str):
+    cursor.execute('''
+        INSERT INTO bot_meta (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    ''', (key, value))
+    conn.commit()
+
+# LOG CHANNELS
+
+def get_log_channel_id(guild_id: int, name: str):
+    reader = _reader()
+    reader.execute('SELECT channel_id FROM log_channels WHERE guild_id = ? AND name = ?', (guild_id, name))
+    row = reader.fetchone()
+    return row[0] if row else None
+
+def set_log_channel_id(guild_id: int, name: str, channel_id: int):
+    cursor.execute('''
+        INSERT INTO log_channels (guild_id, name, channel_id) VALUES (?, ?, ?)
+        ON CONFLICT(guild_id, name) DO UPDATE SET channel_id = excluded.channel_id
+    ''', (guild_id, name, channel_id))
+    conn.commit()
+
+def delete_log_channel_id(guild_id: int, channel_id: int):
+    cursor.execute('DELETE FROM log_channels WHERE guild_id = ? AND channel_id = ?', (guild_id, channel_id))
+    conn.commit()
+
+# DM OPT-OUT
+
+def get_dm_optouts():
+    cursor.execute('SELECT user_id FROM dm_optout')
+    return {row[0] for row in cursor.fetchall()}
+
+def set_dm_optout(user_id: int, opted_out: bool):
+    if opted_out:
+        cursor.execute('INSERT OR IGNORE INTO dm_optout (user_id) VALUES (?)', (user_id,))
+    else:
+        cursor.execute('DELETE FROM dm_optout WHERE user_id = ?', (user_id,))
+    conn.commit()
+
+# SCHEDULED JOBS
+
+def schedule_job(kind: str, job_key: str, guild_id, expires_at: float, payload: dict):
+    # mesmo (kind, job_key) de novo: troca horário e payload, mantém o id
+    try:
+        cursor.execute('''
+            INSERT INTO scheduled_jobs (kind, job_key, guild_id, expires_at, payload)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(kind, job_key) DO UPDATE SET
+                guild_id = excluded.guild_id,
+                expires_at = excluded.expires_at,
+                payload = excluded.payload
+            RETURNING id
+        ''', (kind, job_key, guild_id, expires_at, json.dumps(payload)))
+        job_id = cursor.fetchone()[0]
+        conn.commit()
+        return job_id
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"[ERRO] Falha ao agendar job {kind}/{job_key}: {e}")
+        return None
+
+def cancel_scheduled_job(kind: str, job_key: str):
+    cursor.execute('DELETE FROM scheduled_jobs WHERE kind = ? AND job_key = ? RETURNING id', (kind, job_key))
+    row = cursor.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+def delete_scheduled_job(job_id: int, expires_at: float):
+    # só apaga se o job não foi reagendado enquanto o handler rodava
+    cursor.execute('DELETE FROM scheduled_jobs WHERE id = ? AND expires_at = ?', (job_id, expires_at))
+    conn.commit()
+
+def reschedule_job(job_id: int, expires_at: float, new_expires_at: float) -> bool:
+    # retry de um job que falhou; não mexe se ele foi reagendado nesse meio tempo
+    cursor.execute(
+        'UPDATE scheduled_jobs SET expires_at = ? WHERE id = ? AND expires_at = ?',
+        (new_expires_at, job_id, expires_at)
+    )
+    conn.commit()
+    return cursor.rowcount > 0
+
+def get_scheduled_jobs():
+    cursor.execute('SELECT id, kind, expires_at, payload FROM scheduled_jobs ORDER BY expires_at')
+    return [(job_id, kind, expires_at, json.loads(payload)) for job_id, kind, expires_at, payload in cursor.fetchall()]
+
+def bootstrap_guilds(guilds):
+    # startup: nomes e lojas de todas as guilds (lista de (guild_id, guild_name))
+    # numa transação só. Devolve quantas lojas foram criadas.
+    try:
+        with conn:
+            cursor.executemany('''
+                INSERT INTO guilds (guild_id, guild_name)
+                VALUES (?, ?)
+                ON CONFLICT(guild_id) DO UPDATE SET guild_name = excluded.guild_name
+            ''', guilds)
+            before = conn.total_changes
+            cursor.executemany('''
+                INSERT INTO loja (guild_id, product_name, description, price)
+                SELECT ?, NULL, NULL, NULL
+                WHERE NOT EXISTS (SELECT 1 FROM loja WHERE guild_id = ?)
+            ''', [(guild_id, guild_id) for guild_id, _ in guilds])
+            return conn.total_changes - before
+    except sqlite3.Error as e:
+        print(f"[ERRO] Falha no bootstrap das guilds: {e}")
+        return 0
+
 
 # GET FUNCTIONS    
 def get_user_data(user_id, guild_id):
-    if not user_exists(user_id, guild_id):
-        print(f"[AVISO] usuario {user_id} não encontrado")
-        return None
+    def query():
+        reader = _reader()
+        reader.execute('SELECT xp, level, vitorias, derrotas FROM users WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
+        return reader.fetchone()
+
     try:
-        cursor.execute('SELECT xp, level, vitorias, derrotas FROM users WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
-        return cursor.fetchone()
+        row, pending_xp = _read_with_pending((user_id, guild_id), (_pending_xp, _flushing_xp), query)
+        if not row:
+            if pending_xp:
+                return (pending_xp, profile_utils.calculate_level(pending_xp)["level"], 0, 0)
+            print(f"[AVISO] usuario {user_id} não encontrado")
+            return None
+        if pending_xp:
+            xp = row[0] + pending_xp
+            return (xp, profile_utils.calculate_level(xp)["level"], row[2], row[3])
+        return row
     except sqlite3.Error as e:
         print(f"[ERRO] Falha na requisicao de dados {user_id}: {e}")
         return None
 
+def get_guild_user_ids(guild_id):
+    reader = _reader()
+    reader.execute("SELECT user_id FROM users WHERE guild_id = ?", (guild_id,))
+    return {row[0] for row in reader.fetchall()}
+
 def get_top_users(guild_id):
-    cursor.execute(
+    reader = _reader()
+    reader.execute(
         "SELECT user_id, xp, vitorias, derrotas FROM users WHERE guild_id = ?",
         (guild_id,)
     )
-    return cursor.fetchall()
+    return reader.fetchall()
+
+
+# RANKING
+# Cada guild tem um GuildLeaderboard em memória, carregado do banco na primeira
+# consulta e mantido pelas funções de escrita acima (_leaderboard_update).
+# Ordem: categoria DESC, user_id ASC no desempate. O XP ainda no buffer do
+# write-behind só entra no ranking no próximo flush (alguns segundos).
+
+_leaderboards = {}
+
+def _ranking_column(category: str) -> str:
+    column = RANKING_COLUMNS.get(category)
+    if column is None:
+        raise ValueError(f"Categoria de ranking inválida: {category}")
+    return column
+
+def _leaderboard(guild_id: int) -> GuildLeaderboard:
+    board = _leaderboards.get(guild_id)
+    if board is None:
+        # sob o lock do writer: nenhuma escrita passa entre o SELECT e o registro
+        with lock:
+            board = _leaderboards.get(guild_id)
+            if board is None:
+                cursor.execute(
+                    "SELECT user_id, xp, vitorias, derrotas FROM users WHERE guild_id = ? ORDER BY xp DESC, user_id",
+                    (guild_id,)
+                )
+                board = GuildLeaderboard(cursor.fetchall())
+                _leaderboards[guild_id] = board
+    return board
+
+def _leaderboard_update(guild_id: int, user_id: int, **values):
+    # guild ainda não carregada: o próximo carregamento já lê o valor novo do banco
+    board = _leaderboards.get(guild_id)
+    if board is not None:
+        board.update(user_id, **values)
+
+def get_ranking_page(guild_id: int, category: str, limit: int = 10, offset: int = 0):
+    return _leaderboard(guild_id).page(_ranking_column(category), limit, offset)
+
+def count_ranked_users(guild_id: int) -> int:
+    return len(_leaderboard(guild_id))
+
+def get_user_rank(user_id: int, guild_id: int, category: str):
+    # (posição, valor) ou None se o usuário não está na tabela
+    return _leaderboard(guild_id).rank(user_id, _ranking_column(category))
 
 # DELETE FUNCTIONS
 
 def delete_user(user_id, guild_id):
+    flush_pending()
     try:
         tables_with_user = [
             "users",
             "messages",
             "call_time",
+            "voice_sessions",
             "punishments",
             "boost_xp",
             "user_badges",
@@ -339,23 +943,33 @@ def delete_user(user_id, guild_id):
         for table in tables_with_user:
             cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND guild_id = ?" , (user_id , guild_id))
         conn.commit()
+        _touch(user_id, guild_id)
+        board = _leaderboards.get(guild_id)
+        if board is not None:
+            board.remove(user_id)
+        if _boosts is not None:
+            _boosts.remove(guild_id, user_id)
         print(f"✅ Todos os dados do usuário {user_id} no servidor {guild_id} foram removidos.")
     except sqlite3.Error as e:
         conn.rollback()
         print(f"❌ Erro ao remover usuário {user_id} da guild {guild_id}: {e}")
 
 def delete_guild_data(guild_id: int):
+    flush_pending()
     try:
         tables_with_guild = [
             "users",
             "messages",
             "call_time",
+            "voice_sessions",
             "punishments",
             "boost_xp",
             "user_badges",
             "vip_roles",
             "loja",
             "casamentos",
+            "scheduled_jobs",
+            "log_channels",
             "guilds"
         ]
         for table in tables_with_guild:
@@ -365,6 +979,10 @@ def delete_guild_data(guild_id: int):
                 print(f"[AVISO] Tabela '{table}' não encontrada — ignorando.")
 
         conn.commit()
+        _touch_guild(guild_id)
+        _leaderboards.pop(guild_id, None)
+        if _boosts is not None:
+            _boosts.remove_guild(guild_id)
         print(f"✅ Todos os dados do servidor {guild_id} foram removidos com sucesso.")
     except sqlite3.Error as e:
         conn.rollback()
@@ -373,22 +991,33 @@ def delete_guild_data(guild_id: int):
 # RESET FUNCTIONS
 
 def reset_user_xp(user_id, guild_id):
+    flush_pending()
     if not user_exists(user_id, guild_id):
         print(f"[AVISO] usuario {user_id} não encontrado")
         return None
     try:
-        cursor.execute('UPDATE users SET xp = 0 WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
+        cursor.execute('UPDATE users SET xp = 0, level = 0 WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
         conn.commit()
+        _touch(user_id, guild_id)
+        _leaderboard_update(guild_id, user_id, xp=0)
     except sqlite3.Error as e:
         print(f"[ERRO] Falha na execucao do UPDATE de XP {user_id}: {e}")
 
 def reset_user_lose(user_id, guild_id):
     cursor.execute('UPDATE users SET derrotas = 0 WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
+    updated = cursor.rowcount
     conn.commit()
+    _touch(user_id, guild_id)
+    if updated:
+        _leaderboard_update(guild_id, user_id, derrotas=0)
 
 def reset_user_win(user_id, guild_id):
     cursor.execute('UPDATE users SET vitorias = 0 WHERE user_id = ? AND guild_id = ?', (user_id, guild_id))
+    updated = cursor.rowcount
     conn.commit()
+    _touch(user_id, guild_id)
+    if updated:
+        _leaderboard_update(guild_id, user_id, vitorias=0)
 
 # SHOP FUNCTIONS
 
@@ -477,14 +1106,19 @@ def increment_message_count(user_id: int, guild_id: int, amount: int = 1):
             count = count + excluded.count
     ''', (user_id, guild_id, amount))
     conn.commit()
+    _touch(user_id, guild_id)
 
 def get_message_count(user_id: int, guild_id: int) -> int:
-    cursor.execute(
-        "SELECT count FROM messages WHERE user_id = ? AND guild_id = ?",
-        (user_id, guild_id)
-    )
-    result = cursor.fetchone()
-    return result[0] if result else 0
+    def query():
+        reader = _reader()
+        reader.execute(
+            "SELECT count FROM messages WHERE user_id = ? AND guild_id = ?",
+            (user_id, guild_id)
+        )
+        return reader.fetchone()
+
+    result, pending = _read_with_pending((user_id, guild_id), (_pending_messages, _flushing_messages), query)
+    return (result[0] if result else 0) + pending
 
 
 def add_call_time(user_id: int, guild_id: int, seconds: int):
@@ -495,13 +1129,47 @@ def add_call_time(user_id: int, guild_id: int, seconds: int):
             seconds = seconds + excluded.seconds
     ''', (user_id, guild_id, seconds))
     conn.commit()
+    _touch(user_id, guild_id)
+
+def add_call_time_bulk(credits, sessions=(), ended=()):
+    # um tick do tempo em call numa transação só:
+    # credits [(user_id, guild_id, seconds)], sessions abertas [(guild_id, user_id, accounted_at, seen_at)]
+    # e sessões encerradas [(guild_id, user_id)]
+    credits = [row for row in credits if row[2] > 0]
+    try:
+        with conn:
+            cursor.executemany('''
+                INSERT INTO call_time (user_id, guild_id, seconds)
+                VALUES (?, ?, ?)
+                ON CONFLICT(user_id, guild_id) DO UPDATE SET
+                    seconds = seconds + excluded.seconds
+            ''', credits)
+            cursor.executemany('''
+                INSERT INTO voice_sessions (guild_id, user_id, accounted_at, seen_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET
+                    accounted_at = excluded.accounted_at,
+                    seen_at = excluded.seen_at
+            ''', sessions)
+            cursor.executemany('DELETE FROM voice_sessions WHERE guild_id = ? AND user_id = ?', ended)
+    except sqlite3.Error as e:
+        print(f"[ERRO] Falha ao gravar tempo em call: {e}")
+        return False
+    for user_id, guild_id, _ in credits:
+        _touch(user_id, guild_id)
+    return True
+
+def get_voice_sessions():
+    cursor.execute('SELECT guild_id, user_id, accounted_at, seen_at FROM voice_sessions')
+    return cursor.fetchall()
 
 def get_call_time(user_id: int, guild_id: int) -> int:
-    cursor.execute(
+    reader = _reader()
+    reader.execute(
         "SELECT seconds FROM call_time WHERE user_id = ? AND guild_id = ?",
         (user_id, guild_id)
     )
-    result = cursor.fetchone()
+    result = reader.fetchone()
     return result[0] if result else 0
 
 
@@ -531,6 +1199,23 @@ def count_punishments(user_id: int, guild_id: int) -> int:
 
 
 # BOOST_XP
+# Os boosts ativos ficam num BoostRegistry em memória, carregado do banco no
+# init_db e mantido por set_boost_xp/remove_boost(s): as leituras abaixo
+# não fazem query. Linhas vencidas ficam no banco até o job boost_end ou o boost_checker da loja.
+
+_boosts = None
+
+def _boost_registry() -> BoostRegistry:
+    global _boosts
+    if _boosts is None:
+        with lock:
+            if _boosts is None:
+                cursor.execute(
+                    "SELECT user_id, guild_id, multiplier, expires_at FROM boost_xp WHERE expires_at > ?",
+                    (int(time.time()),)
+                )
+                _boosts = BoostRegistry(cursor.fetchall())
+    return _boosts
 
 def set_boost_xp(user_id: int, guild_id: int, multiplier: float, duration: int):
 
@@ -540,17 +1225,25 @@ def set_boost_xp(user_id: int, guild_id: int, multiplier: float, duration: int):
         (user_id, guild_id, multiplier, expires_at)
     )
     conn.commit()
+    _boost_registry().set(guild_id, user_id, multiplier, expires_at)
+    return expires_at
+
+
+def get_active_boost_multipliers(keys):
+    # multiplicadores ativos de vários (user_id, guild_id);
+    # quem não tem boost ativo fica fora do dict
+    registry = _boost_registry()
+    now = int(time.time())
+    boosts = {}
+    for user_id, guild_id in keys:
+        multiplier = registry.get(guild_id, user_id, now)
+        if multiplier is not None:
+            boosts[(user_id, guild_id)] = multiplier
+    return boosts
 
 
 def check_boost_active(user_id: int, guild_id: int) -> bool:
-    
-    cursor.execute(
-        "SELECT expires_at FROM boost_xp WHERE user_id = ? AND guild_id = ?", (user_id, guild_id)
-    )
-    result = cursor.fetchone()
-    if not result:
-        return False
-    return result[0] > int(time.time())
+    return _boost_registry().get(guild_id, user_id) is not None
 
 
 def remove_boost(user_id: int, guild_id: int):
@@ -559,24 +1252,40 @@ def remove_boost(user_id: int, guild_id: int):
         "DELETE FROM boost_xp WHERE user_id = ? AND guild_id = ?", (user_id, guild_id)
     )
     conn.commit()
+    _boost_registry().remove(guild_id, user_id)
 
 
-def get_active_boost_multiplier(user_id: int, guild_id: int) -> float:
-    
+def get_boosts_expired(limit: int = 100):
+    # vencidos mais antigos primeiro, em lotes (usa idx_boost_xp_expires_at)
     cursor.execute(
-        "SELECT multiplier, expires_at FROM boost_xp WHERE user_id = ? AND guild_id = ?",
-        (user_id, guild_id)
+        "SELECT user_id, guild_id FROM boost_xp WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+        (int(time.time()), limit)
     )
-    result = cursor.fetchone()
-    if not result:
-        return 1.0
+    return cursor.fetchall()
 
-    multiplier, expires_at = result
-    if expires_at > int(time.time()):
-        return multiplier
-    else:
-        remove_boost(user_id, guild_id)
-        return 1.0
+
+def remove_boosts(keys):
+    # remove os (user_id, guild_id) que ainda estão vencidos, numa transação; um
+    # boost renovado depois da leitura fica. Devolve só os que foram removidos.
+    now = int(time.time())
+    removed = []
+    with conn:
+        for user_id, guild_id in keys:
+            cursor.execute(
+                "DELETE FROM boost_xp WHERE user_id = ? AND guild_id = ? AND expires_at <= ?",
+                (user_id, guild_id, now)
+            )
+            if cursor.rowcount:
+                removed.append((user_id, guild_id))
+    registry = _boost_registry()
+    for user_id, guild_id in removed:
+        registry.remove(guild_id, user_id)
+    return removed
+
+
+def get_active_boost_multiplier(user_id: int, guild_id: int) -> float:
+    multiplier = _boost_registry().get(guild_id, user_id)
+    return 1.0 if multiplier is None else multiplier
     
 
 def cleanup_expired_boosts():
@@ -597,6 +1306,7 @@ def add_user_badge(user_id: int , guild_id: int , badge_key: str):
         VALUES (? , ? , ? )
                    ''',(user_id, guild_id , badge_key))
     conn.commit()
+    _touch(user_id, guild_id)
     
 
 def has_user_badge(user_id: int , guild_id : int , badge_key: str) -> bool :
@@ -608,13 +1318,14 @@ def has_user_badge(user_id: int , guild_id : int , badge_key: str) -> bool :
 
 
 def get_user_badges(user_id: int, guild_id: int):
-    cursor.execute('''
+    reader = _reader()
+    reader.execute('''
         SELECT badge_key, acquired_at
         FROM user_badges
         WHERE user_id = ? AND guild_id = ?
         ORDER BY acquired_at ASC
     ''', (user_id, guild_id))
-    rows = cursor.fetchall()
+    rows = reader.fetchall()
     return [{"badge_key": r[0], "acquired_at": r[1]} for r in rows]   
 
 def get_badge_holders(guild_id: int, badge_key: str):
@@ -630,6 +1341,7 @@ def remove_user_badge(user_id: int, guild_id: int, badge_key: str):
         (user_id, guild_id, badge_key)
     )
     conn.commit()
+    _touch(user_id, guild_id)
 
 
 #MARRIAGE SYSTEM
@@ -682,16 +1394,24 @@ def factory_reset():
         "vip_roles",
         "messages",
         "call_time",
+        "voice_sessions",
         "punishments",
         "boost_xp",
         "user_badges",
-        "casamentos"
+        "casamentos",
+        "scheduled_jobs",
+        "log_channels"
     ]
     
+    flush_pending()
     try:
         for table in tables_to_clear:
             cursor.execute(f"DELETE FROM {table}")
         conn.commit()
+        _touch_all()
+        _leaderboards.clear()
+        if _boosts is not None:
+            _boosts.clear()
         print("[INFO] Banco de dados resetado com sucesso (factory_reset).")
     except sqlite3.Error as e:
         print(f"[ERRO] Falha ao resetar o banco: {e}")
@@ -821,4 +1541,31 @@ def remove_participant_from_team(guild_id, user_id):
             return True
 
     print(f"[WARN] Usuário {user_id} não encontrado em nenhum time do servidor {guild_id}.")
-    return False
\ No newline at end of file
+    return False
+
+
+# THREAD SAFETY
+# o db_async roda estas funções na thread dele enquanto outros pontos ainda chamam
+# direto do event loop, então toda função pública segura o lock da conexão.
+# As leituras de READ_ONLY usam as conexões de leitura e não precisam dele.
+
+READ_ONLY = {
+    "get_user_data", "get_top_users", "get_message_count", "get_call_time", "get_user_badges",
+    "get_ranking_page", "count_ranked_users", "get_user_rank", "get_guild_user_ids",
+    "get_log_channel_id"
+}
+_LOCK_FREE = READ_ONLY | {
+    "buffer_message", "buffer_xp", "get_stats_version",
+    "get_active_boost_multiplier", "get_active_boost_multipliers", "check_boost_active"
+}
+
+def _synchronized(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+for _name, _func in list(globals().items()):
+    if callable(_func) and getattr(_func, "__module__", None) == __name__ and not _name.startswith("_") and _name not in _LOCK_FREE:
+        globals()[_name] = _synchronized(_func)
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+# Fachada async do db: `await db_async.add_xp(...)` roda db.add_xp numa thread
+# dedicada, assim o I/O do SQLite nunca trava o event loop do discord.py.
+# Um worker só basta (o SQLite tem um único writer) e mantém a ordem das chamadas.
+# As leituras de db.READ_ONLY vão para um pool separado, cada thread com a sua
+# conexão de leitura, e não ficam na fila atrás das escritas.
+READER_THREADS = 4
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+_read_executor = ThreadPoolExecutor(max_workers=READER_THREADS, thread_name_prefix="db-read")
+
+
+async def run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_read(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_read_executor, functools.partial(func, *args, **kwargs))
+
+
+def __getattr__(name: str):
+    func = getattr(db, name, None)
+    if name.startswith("_") or not inspect.isfunction(func):
+        raise AttributeError(f"module 'db_async' has no attribute '{name}'")
+
+    runner = run_read if name in db.READ_ONLY else run
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await runner(func, *args, **kwargs)
+
+    globals()[name] = wrapper
+    return wrapper
+
+
+def shutdown():
+    _read_executor.shutdown(wait=True)
+    _executor.shutdown(wait=True)
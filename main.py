@@ -2,8 +2,14 @@ import discord
 from discord.ext import commands
 import os
 import asyncio
+import time
+import json
+import hashlib
 import db
+import db_async
 from utils import logger
+from utils.scheduler import Scheduler
+from utils.log_channels import log_channels
 from dotenv import load_dotenv
 import threading
 from web import app
@@ -14,42 +20,103 @@ def run_web():
     app.run(host="0.0.0.0", port=8080)
 
 
-threading.Thread(target=run_web, daemon=True).start()
-
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC") == "1"
+
+class Bot(commands.Bot):
+    async def close(self):
+        # envia os logs ainda no buffer enquanto a conexão está aberta
+        await logger.close_logs()
+        await super().close()
+
 
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix='/', intents=intents, help_command=None)
-db.init_db()
+bot = Bot(command_prefix='/', intents=intents, help_command=None)
+# timers persistentes; os cogs registram os handlers ao carregar
+bot.scheduler = Scheduler()
 
 
-@bot.event
-async def on_ready():
-    print(f'🤖 Logado como {bot.user}')
-    
-    for guild in bot.guilds:
-        db.update_guild_name(guild.id , guild.name)
-        db.ensure_guild_shop_exists(guild.id)
-    
+# STARTUP
+# on_ready dispara de novo a cada resume do gateway; o pipeline roda uma vez por
+# processo, em background, para o bot já responder interações logo após conectar.
+_startup_task = None
+
+
+async def _timed_stage(name, stage):
+    start = time.perf_counter()
+    try:
+        detail = await stage()
+    except Exception as e:
+        print(f"[STARTUP] {name}: falhou após {time.perf_counter() - start:.2f}s — {e}")
+        return
+    print(f"[STARTUP] {name}: {time.perf_counter() - start:.2f}s" + (f" — {detail}" if detail else ""))
+
+
+# hash estável do que o tree.sync() enviaria; guardado no bot_meta por aplicação
+def command_tree_fingerprint():
+    payload = sorted(
+        (cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands()),
+        key=lambda data: (data.get("type", 1), data["name"])
+    )
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+async def sync_commands():
+    meta_key = f"command_tree_hash:{bot.application_id}"
+    fingerprint = command_tree_fingerprint()
+    if not FORCE_COMMAND_SYNC and await db_async.get_meta(meta_key) == fingerprint:
+        return f"sync pulado, árvore de comandos inalterada ({fingerprint[:12]})"
+
     synced = await bot.tree.sync()
-    print(f"🌐 Synced {len(synced)} slash commands.")
+    await db_async.set_meta(meta_key, fingerprint)
+    return f"{len(synced)} slash commands sincronizados (hash {fingerprint[:12]})"
+
+
+async def bootstrap_guilds():
+    created = await db_async.bootstrap_guilds([(guild.id, guild.name) for guild in bot.guilds])
+    return f"{len(bot.guilds)} servidores, {created} lojas criadas"
+
 
+async def reconcile_members():
+    admin = bot.get_cog("Admin")
+    added = 0
     for guild in bot.guilds:
-        total= 0
-        for member in guild.members:
-            if not member.bot:
-                db.ensure_user_exists(member.id, guild.id)
-                total +=1
-        print(f"[STARTUP SYNC] {total} membros verificados/cadastrados no servidor {guild.name}.")
+        if admin:
+            added += await admin.reconcile_guild(guild)
+        else:
+            added += len(await db_async.ensure_users_exist(guild.id, [m.id for m in guild.members if not m.bot]))
+    return f"{added} membros cadastrados"
+
+
+async def start_scheduler():
+    pending = await bot.scheduler.start()
+    return f"{pending} timers pendentes"
+
+
+async def startup_pipeline():
+    start = time.perf_counter()
+    await asyncio.gather(
+        _timed_stage("sync de comandos", sync_commands),
+        _timed_stage("bootstrap do banco", bootstrap_guilds),
+        _timed_stage("reconciliação de membros", reconcile_members),
+        _timed_stage("agendador", start_scheduler),
+    )
+    print(f"[STARTUP] pipeline concluído em {time.perf_counter() - start:.2f}s")
+
+
+@bot.event
+async def on_ready():
+    global _startup_task
+    print(f'🤖 Logado como {bot.user}')
+    if _startup_task is None:
+        _startup_task = asyncio.create_task(startup_pipeline())
 
 @bot.event
 async def on_guild_join(guild):
-    db.update_guild_name(guild.id, guild.name)
-    db.ensure_guild_shop_exists(guild.id)
-    for member in guild.members:
-        if not member.bot:
-            db.ensure_user_exists(member.id, guild.id)
+    await db_async.bootstrap_guilds([(guild.id, guild.name)])
+    await db_async.ensure_users_exist(guild.id, [member.id for member in guild.members if not member.bot])
     print(f"✅ Novo servidor adicionado: {guild.name} ({guild.id})")
 
 
@@ -57,13 +124,34 @@ async def on_guild_join(guild):
 @bot.event
 async def on_guild_remove(guild):
     print(f"🧹 Servidor removido: {guild.name} ({guild.id}) — limpando banco...")
-    db.delete_guild_data(guild.id)
+    await db_async.delete_guild_data(guild.id)
+    log_channels.forget_guild(guild.id)
+    admin = bot.get_cog("Admin")
+    if admin:
+        admin.known_members.pop(guild.id, None)
+
+
+# o cache de canais de log acompanha os eventos de canal do gateway
+@bot.event
+async def on_guild_channel_create(channel):
+    log_channels.channel_created(channel)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    log_channels.channel_updated(before, after)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    await log_channels.channel_deleted(channel)
 
 
 
 @bot.event
 async def on_member_remove(member):
-    db.delete_user(member.id, member.guild.id)
+    await db_async.delete_user(member.id, member.guild.id)
+    admin = bot.get_cog("Admin")
+    if admin:
+        admin.forget_member(member.guild.id, member.id)
 
 
 @bot.event
@@ -126,10 +214,20 @@ async def load_extensions():
 
 
 async def main():
-    async with bot:
-        await load_extensions()
-        await bot.start(TOKEN)
+    try:
+        async with bot:
+            await load_extensions()
+            await bot.start(TOKEN)
+    finally:
+        bot.scheduler.stop()
+        db_async.shutdown()
+        db.flush_pending()
 
 
 if __name__ == "__main__":
+    # fica aqui e não no topo do módulo: os workers do render_service (spawn)
+    # reimportam este arquivo como __mp_main__ e não podem subir o Flask nem
+    # abrir o banco (o import do db não conecta; só o init_db abre o ranking.db)
+    threading.Thread(target=run_web, daemon=True).start()
+    db.init_db()
     asyncio.run(main())
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+import aiohttp
+
+from utils import profile_utils
+
+# Cache dos avatares usados no card de perfil, indexado pelo hash do avatar
+# (Asset.key), que só muda quando o usuário troca de avatar.
+# Memória: LRU de tiles já decodificados e recortados (200x200 RGBA crus, ~160 KB cada).
+# Disco (opcional): AVATAR_CACHE_DIR guarda os mesmos bytes e sobrevive a restarts.
+AVATAR_CACHE_SIZE = int(os.getenv("AVATAR_CACHE_SIZE", 256))
+AVATAR_CACHE_DIR = os.getenv("AVATAR_CACHE_DIR")
+AVATAR_FETCH_SIZE = 256
+AVATAR_TIMEOUT_SECONDS = 5
+
+
+class AvatarCache:
+    def __init__(self, max_entries: int = AVATAR_CACHE_SIZE, cache_dir: str = AVATAR_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._tiles = OrderedDict()
+        self._inflight = {}
+        self._session = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=AVATAR_TIMEOUT_SECONDS)
+            )
+        return self._session
+
+    def _remember(self, key: str, tile: bytes):
+        self._tiles[key] = tile
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_entries:
+            self._tiles.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.rgba")
+
+    def _read_disk(self, key: str):
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, tile: bytes):
+        tmp = self._disk_path(key) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(tile)
+        os.replace(tmp, self._disk_path(key))
+
+    # avatar é um discord.Asset; devolve o tile para o render_profile_card ou None
+    async def get_tile(self, avatar):
+        key = avatar.key
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+
+        # um download por hash, mesmo com vários /info do mesmo usuário ao mesmo tempo
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, avatar.with_size(AVATAR_FETCH_SIZE).url))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str, url: str):
+        if self.cache_dir:
+            tile = await asyncio.to_thread(self._read_disk, key)
+            if tile is not None:
+                self.disk_hits += 1
+                self._remember(key, tile)
+                return tile
+
+        self.misses += 1
+        try:
+            async with self._get_session().get(url) as resp:
+                resp.raise_for_status()
+                data = await resp.read()
+            tile = await asyncio.to_thread(profile_utils.avatar_tile, data)
+        except Exception as e:
+            logging.warning(f"[AVISO] Falha ao baixar avatar {key}: {e}")
+            return None
+
+        self._remember(key, tile)
+        if self.cache_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, tile)
+            except OSError as e:
+                logging.warning(f"[AVISO] Não foi possível salvar o avatar {key} em disco: {e}")
+        return tile
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._tiles),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,67 @@
+import heapq
+import threading
+import time
+
+# Boosts de XP ativos em memória, por guild: {user_id: (multiplier, expires_at)}
+# e um min-heap de (expires_at, user_id). A leitura expira o topo do heap
+# preguiçosamente (O(log n) por boost vencido) e responde sem tocar no banco.
+# Um boost trocado deixa a entrada antiga no heap; ela é ignorada ao sair porque
+# o expires_at não bate mais com o do dict.
+# Quem carrega e atualiza é o db.py (set_boost_xp, remove_boost etc.).
+
+
+class BoostRegistry:
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._active = {}
+        self._heaps = {}
+        for user_id, guild_id, multiplier, expires_at in rows:
+            self._set(guild_id, user_id, multiplier, expires_at)
+
+    def __len__(self):
+        return sum(len(active) for active in self._active.values())
+
+    def _set(self, guild_id, user_id, multiplier, expires_at):
+        self._active.setdefault(guild_id, {})[user_id] = (multiplier, expires_at)
+        heapq.heappush(self._heaps.setdefault(guild_id, []), (expires_at, user_id))
+
+    def _expire(self, guild_id, now):
+        heap = self._heaps.get(guild_id)
+        if not heap:
+            return
+        active = self._active[guild_id]
+        while heap and heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(heap)
+            entry = active.get(user_id)
+            if entry and entry[1] == expires_at:
+                del active[user_id]
+        if not heap:
+            del self._heaps[guild_id]
+            del self._active[guild_id]
+
+    def set(self, guild_id, user_id, multiplier, expires_at):
+        with self._lock:
+            self._set(guild_id, user_id, multiplier, expires_at)
+
+    def remove(self, guild_id, user_id):
+        with self._lock:
+            active = self._active.get(guild_id)
+            if active:
+                active.pop(user_id, None)
+
+    def remove_guild(self, guild_id):
+        with self._lock:
+            self._active.pop(guild_id, None)
+            self._heaps.pop(guild_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._active.clear()
+            self._heaps.clear()
+
+    # multiplicador ativo ou None
+    def get(self, guild_id, user_id, now=None):
+        with self._lock:
+            self._expire(guild_id, time.time() if now is None else now)
+            entry = self._active.get(guild_id, {}).get(user_id)
+            return entry[0] if entry else None
@@ -0,0 +1,49 @@
+import os
+from collections import OrderedDict
+
+# Cache dos PNGs finais do /info, um por (guild, usuário). A entrada só vale
+# enquanto o token bate: versão dos stats (db.get_stats_version), hash do avatar
+# e nome exibido. Qualquer escrita no db troca a versão e o card é refeito.
+# O limite é em bytes (CARD_CACHE_MAX_MB); os menos usados saem primeiro.
+CARD_CACHE_MAX_BYTES = int(os.getenv("CARD_CACHE_MAX_MB", 32)) * 1024 * 1024
+
+
+class CardCache:
+    def __init__(self, max_bytes: int = CARD_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._cards = OrderedDict()
+
+    def get(self, guild_id: int, user_id: int, token):
+        entry = self._cards.get((guild_id, user_id))
+        if entry is None or entry[0] != token:
+            self.misses += 1
+            return None
+        self._cards.move_to_end((guild_id, user_id))
+        self.hits += 1
+        return entry[1]
+
+    def put(self, guild_id: int, user_id: int, token, png: bytes):
+        self.discard(guild_id, user_id)
+        if len(png) > self.max_bytes:
+            return
+        self._cards[(guild_id, user_id)] = (token, png)
+        self.size += len(png)
+        while self.size > self.max_bytes:
+            _, (_, old) = self._cards.popitem(last=False)
+            self.size -= len(old)
+
+    def discard(self, guild_id: int, user_id: int):
+        entry = self._cards.pop((guild_id, user_id), None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._cards),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
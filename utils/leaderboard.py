@@ -0,0 +1,61 @@
+import bisect
+import threading
+
+# Ranking em memória de uma guild. Para cada categoria há uma lista ordenada de
+# (-valor, user_id), a mesma ordem do ranking no banco (valor DESC, user_id ASC):
+# posição e página saem por bisect/slice, e uma escrita move só um item.
+# Quem cria, carrega e atualiza é o db.py (get_leaderboard e as funções de escrita).
+CATEGORIES = ("xp", "vitorias", "derrotas")
+
+
+class GuildLeaderboard:
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self.rows = {user_id: (xp, vitorias, derrotas) for user_id, xp, vitorias, derrotas in rows}
+        self._keys = {}
+        for index, category in enumerate(CATEGORIES):
+            self._keys[category] = sorted((-row[index], user_id) for user_id, row in self.rows.items())
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _move(self, keys, old_value, new_value, user_id):
+        if old_value is not None:
+            del keys[bisect.bisect_left(keys, (-old_value, user_id))]
+        if new_value is not None:
+            bisect.insort(keys, (-new_value, user_id))
+
+    # None mantém o valor atual; usuário novo começa com 0 nas outras colunas
+    def update(self, user_id, xp=None, vitorias=None, derrotas=None):
+        with self._lock:
+            old = self.rows.get(user_id)
+            base = old or (0, 0, 0)
+            new = tuple(base[i] if value is None else value for i, value in enumerate((xp, vitorias, derrotas)))
+            if new == old:
+                return
+            self.rows[user_id] = new
+            for index, category in enumerate(CATEGORIES):
+                if old is None or old[index] != new[index]:
+                    self._move(self._keys[category], old[index] if old else None, new[index], user_id)
+
+    def remove(self, user_id):
+        with self._lock:
+            old = self.rows.pop(user_id, None)
+            if old is None:
+                return
+            for index, category in enumerate(CATEGORIES):
+                self._move(self._keys[category], old[index], None, user_id)
+
+    def page(self, category, limit, offset=0):
+        with self._lock:
+            keys = self._keys[category][offset:offset + limit]
+            return [(user_id, *self.rows[user_id]) for _, user_id in keys]
+
+    # (posição, valor) ou None
+    def rank(self, user_id, category):
+        with self._lock:
+            row = self.rows.get(user_id)
+            if row is None:
+                return None
+            value = row[CATEGORIES.index(category)]
+            return bisect.bisect_left(self._keys[category], (-value, user_id)) + 1, value
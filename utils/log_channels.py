@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import discord
+
+import db_async
+
+# Canais de log por guild e nome ("logs-bot", "logs-punições", "bot-logs").
+# Guarda só o ID (guild.get_channel é O(1) e nunca devolve canal apagado) e
+# persiste no banco o canal escolhido, então renomear o canal não cria outro.
+# Um lock por (guild, nome) garante um único create_text_channel mesmo com
+# vários eventos ao mesmo tempo. Os eventos de canal do gateway (main.py)
+# invalidam o cache; sem create, "não existe" também fica em cache até alguém
+# criar um canal com esse nome.
+# Se o create falhar (ex.: sem Manage Channels), a falha fica em cache por
+# LOG_CHANNEL_CREATE_RETRY_SECONDS e nesse tempo resolve devolve None sem tentar.
+LOG_CHANNEL_CREATE_RETRY_SECONDS = 600
+_MISS = object()
+
+
+class LogChannelResolver:
+    def __init__(self):
+        self._ids = {}
+        self._locks = {}
+        self._create_failed = {}
+
+    def _can_create(self, key, create):
+        return create is not None and self._create_failed.get(key, 0) <= time.monotonic()
+
+    def _cached(self, guild, key, create):
+        channel_id = self._ids.get(key, _MISS)
+        if channel_id is _MISS:
+            return _MISS
+        if channel_id is None:
+            return _MISS if self._can_create(key, create) else None
+        channel = guild.get_channel(channel_id)
+        if channel is None:
+            del self._ids[key]
+            return _MISS
+        return channel
+
+    # create: async create(guild) -> TextChannel, chamado só se não achar nenhum
+    async def resolve(self, guild: discord.Guild, name: str, create=None):
+        key = (guild.id, name)
+        channel = self._cached(guild, key, create)
+        if channel is not _MISS:
+            return channel
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            channel = self._cached(guild, key, create)
+            if channel is not _MISS:
+                return channel
+
+            channel = None
+            channel_id = await db_async.get_log_channel_id(guild.id, name)
+            if channel_id:
+                channel = guild.get_channel(channel_id)
+            if channel is None:
+                channel = discord.utils.get(guild.text_channels, name=name)
+            if channel is None and self._can_create(key, create):
+                try:
+                    channel = await create(guild)
+                except Exception:
+                    self._create_failed[key] = time.monotonic() + LOG_CHANNEL_CREATE_RETRY_SECONDS
+                    self._ids[key] = None
+                    raise
+                self._create_failed.pop(key, None)
+            if channel is None:
+                self._ids[key] = None
+                return None
+
+            if channel.id != channel_id:
+                await db_async.set_log_channel_id(guild.id, name, channel.id)
+            self._ids[key] = channel.id
+            return channel
+
+    def _drop(self, guild_id, channel_id=None, name=None):
+        for key, cached in list(self._ids.items()):
+            if key[0] != guild_id:
+                continue
+            if (channel_id is not None and cached == channel_id) or (cached is None and key[1] == name):
+                del self._ids[key]
+
+    def channel_created(self, channel):
+        self._drop(channel.guild.id, name=channel.name)
+
+    def channel_updated(self, before, after):
+        if before.name != after.name:
+            self._drop(after.guild.id, channel_id=after.id, name=after.name)
+
+    async def channel_deleted(self, channel):
+        self._drop(channel.guild.id, channel_id=channel.id)
+        await db_async.delete_log_channel_id(channel.guild.id, channel.id)
+
+    def forget_guild(self, guild_id: int):
+        for key in [key for key in self._ids if key[0] == guild_id]:
+            del self._ids[key]
+        for key in [key for key in self._locks if key[0] == guild_id]:
+            del self._locks[key]
+        for key in [key for key in self._create_failed if key[0] == guild_id]:
+            del self._create_failed[key]
+
+
+log_channels = LogChannelResolver()
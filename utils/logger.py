@@ -1,10 +1,33 @@
 import discord
+import asyncio
+import io
+import time
 import traceback
 from datetime import datetime
-
-_log_cache = {}
-_cooldowns = {}
-LOG_COOLDOWN = 2  
+from utils.log_channels import log_channels
+
+LOG_CHANNEL_NAME = "logs-bot"
+
+# send_log só monta o embed e põe no buffer da guild; uma task esvazia todos os
+# buffers a cada LOG_FLUSH_SECONDS, com até 10 embeds por mensagem e no máximo
+# LOG_MESSAGES_PER_DRAIN mensagens por guild (o rate limit do canal é ~5 por 5s).
+# Se acumulou mais que isso, vai tudo num .txt anexado. Se um envio falhar, só
+# o que não saiu volta para o buffer; close_logs() esvazia tudo no desligamento.
+# Acima de LOG_MAX_PENDING por guild os mais antigos saem, e o canal é avisado.
+# Guild cujo envio falha (canal não resolve, sem permissão) espera 10s, 20s,
+# 40s... até LOG_RETRY_MAX_SECONDS antes de tentar de novo; a partir de
+# LOG_MAX_FAILURES falhas seguidas o que não saiu é descartado e contado.
+LOG_FLUSH_SECONDS = 5
+LOG_EMBEDS_PER_MESSAGE = 10
+LOG_MESSAGES_PER_DRAIN = 2
+LOG_MAX_EMBED_CHARS = 6000
+LOG_MAX_PENDING = 1000
+LOG_RETRY_MAX_SECONDS = 300
+LOG_MAX_FAILURES = 6
+_buffers = {}
+_dropped = {}
+_failures = {}
+_drainer = None
 
 LOG_STYLES = {
     "info": {"color": discord.Color.blurple(), "emoji": "ℹ️"},
@@ -17,38 +40,147 @@ LOG_STYLES = {
 }
 
 
-async def get_log_channel(guild: discord.Guild) -> discord.TextChannel | None:
-    if not guild:
-        return None
-    if guild.id in _log_cache:
-        return _log_cache[guild.id]
-
-    existing = discord.utils.get(guild.text_channels, name="logs-bot")
-    if existing:
-        _log_cache[guild.id] = existing
-        return existing
-
+async def _create_log_channel(guild: discord.Guild) -> discord.TextChannel:
     overwrites = {guild.default_role: discord.PermissionOverwrite(view_channel=False)}
     for role in guild.roles:
         if role.permissions.administrator:
             overwrites[role] = discord.PermissionOverwrite(view_channel=True, send_messages=False)
+    return await guild.create_text_channel(LOG_CHANNEL_NAME, overwrites=overwrites)
+
 
+async def get_log_channel(guild: discord.Guild) -> discord.TextChannel | None:
+    if not guild:
+        return None
     try:
-        channel = await guild.create_text_channel("logs-bot", overwrites=overwrites)
-        _log_cache[guild.id] = channel
-        return channel
+        return await log_channels.resolve(guild, LOG_CHANNEL_NAME, create=_create_log_channel)
     except Exception as e:
         print(f"[LOGGER] ❌ Falha ao criar canal de logs em {guild.name}: {e}")
         return None
 
 
-def is_on_cooldown(guild_id: int) -> bool:
-    last = _cooldowns.get(guild_id, 0)
-    now = datetime.utcnow().timestamp()
-    return (now - last) < LOG_COOLDOWN
+def _pack(embeds):
+    # grupos de até 10 embeds que respeitam o limite de caracteres por mensagem
+    batches, batch, size = [], [], 0
+    for embed in embeds:
+        length = len(embed)
+        if batch and (len(batch) == LOG_EMBEDS_PER_MESSAGE or size + length > LOG_MAX_EMBED_CHARS):
+            batches.append(batch)
+            batch, size = [], 0
+        batch.append(embed)
+        size += length
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _as_text(embeds) -> str:
+    lines = []
+    for embed in embeds:
+        when = embed.timestamp.strftime("%Y-%m-%d %H:%M:%S") if embed.timestamp else ""
+        lines.append(f"[{when}] {embed.title}")
+        for field in embed.fields:
+            lines.append(f"  {field.name}: {field.value}")
+        if embed.footer and embed.footer.text:
+            lines.append(f"  {embed.footer.text}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+async def _ship(guild: discord.Guild, embeds):
+    # devolve os embeds que não foram enviados (vazio se tudo saiu)
+    channel = await get_log_channel(guild)
+    if not channel:
+        print(f"[LOGGER] Canal de logs indisponível em {guild.name}")
+        return embeds
+
+    dropped = _dropped.pop(guild.id, 0)
+    batches = _pack(embeds)
+    try:
+        if len(batches) <= LOG_MESSAGES_PER_DRAIN:
+            for batch in batches:
+                await channel.send(embeds=batch)
+                embeds = embeds[len(batch):]
+        else:
+            summary = discord.Embed(
+                title=f"📦 {len(embeds)} eventos agrupados",
+                description="Muitos eventos ao mesmo tempo; o log completo está no arquivo anexo.",
+                color=discord.Color.dark_grey(),
+                timestamp=datetime.utcnow()
+            )
+            stamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+            file = discord.File(io.BytesIO(_as_text(embeds).encode()), filename=f"logs-{stamp}.txt")
+            await channel.send(embed=summary, file=file)
+            embeds = []
+        if dropped:
+            await channel.send(f"⚠️ {dropped} eventos de log foram descartados (buffer cheio).")
+            dropped = 0
+    except Exception as e:
+        print(f"[LOGGER] Falha ao enviar logs de {guild.name}: {e}")
+    finally:
+        if dropped:
+            _dropped[guild.id] = _dropped.get(guild.id, 0) + dropped
+    return embeds
+
+
+async def _drain_guild(guild_id: int):
+    guild, embeds = _buffers.pop(guild_id)
+    unsent = await _ship(guild, embeds)
+    if not unsent:
+        _failures.pop(guild_id, None)
+        return
 
-def set_cooldown(guild_id: int):
-    _cooldowns[guild_id] = datetime.utcnow().timestamp()
+    failures = _failures.get(guild_id, (0, 0))[0] + 1
+    delay = min(LOG_FLUSH_SECONDS * 2 ** failures, LOG_RETRY_MAX_SECONDS)
+    _failures[guild_id] = (failures, time.monotonic() + delay)
+    if failures >= LOG_MAX_FAILURES:
+        print(f"[LOGGER] {len(unsent)} eventos de {guild.name} descartados após {failures} falhas")
+        _dropped[guild_id] = _dropped.get(guild_id, 0) + len(unsent)
+        return
+    # só o que não saiu volta, na frente do que chegou enquanto isso
+    _buffers.setdefault(guild_id, (guild, []))[1][:0] = unsent
+    _trim(guild_id)
+
+
+async def flush_logs(force: bool = False):
+    now = time.monotonic()
+    ready = [
+        guild_id for guild_id in list(_buffers)
+        if force or _failures.get(guild_id, (0, 0))[1] <= now
+    ]
+    await asyncio.gather(*(_drain_guild(guild_id) for guild_id in ready))
+
+
+async def close_logs():
+    # no desligamento: para a task e envia o que ainda está no buffer
+    global _drainer
+    if _drainer is not None:
+        _drainer.cancel()
+        _drainer = None
+    await flush_logs(force=True)
+
+
+async def _drain_loop():
+    while True:
+        await asyncio.sleep(LOG_FLUSH_SECONDS)
+        await flush_logs()
+
+
+def _trim(guild_id: int):
+    # limite de memória por guild (canal fora do ar por muito tempo): os mais
+    # antigos saem e a contagem é avisada no canal quando ele voltar
+    pending = _buffers[guild_id][1]
+    excess = len(pending) - LOG_MAX_PENDING
+    if excess > 0:
+        del pending[:excess]
+        _dropped[guild_id] = _dropped.get(guild_id, 0) + excess
+
+
+def _enqueue(guild: discord.Guild, embed: discord.Embed):
+    global _drainer
+    _buffers.setdefault(guild.id, (guild, []))[1].append(embed)
+    _trim(guild.id)
+    if _drainer is None or _drainer.done():
+        _drainer = asyncio.create_task(_drain_loop())
 
 
 async def send_log(ctx_or_interaction, title: str, fields: dict, log_type: str = "info"):
@@ -57,12 +189,6 @@ async def send_log(ctx_or_interaction, title: str, fields: dict, log_type: str =
         user = getattr(ctx_or_interaction, "user", getattr(ctx_or_interaction, "author", None))
         if not guild:
             return
-        if is_on_cooldown(guild.id):
-            return
-
-        channel = await get_log_channel(guild)
-        if not channel:
-            return
 
         style = LOG_STYLES.get(log_type, LOG_STYLES["info"])
 
@@ -80,8 +206,7 @@ async def send_log(ctx_or_interaction, title: str, fields: dict, log_type: str =
 
         embed.set_footer(text=f"Servidor: {guild.name} | Usuário: {user}", icon_url=user.display_avatar.url if user else None)
 
-        await channel.send(embed=embed)
-        set_cooldown(guild.id)
+        _enqueue(guild, embed)
 
     except Exception as e:
         print(f"[LOGGER] Falha ao enviar log: {e}")
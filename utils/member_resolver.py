@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import discord
+
+# Resolve os usuários de uma página (ranking etc.) de uma vez: primeiro o cache
+# de membros da guild e o de usuários do bot, depois o cache TTL de quem já saiu
+# do servidor, e só então um único round de fetch_user em paralelo (limitado).
+# Quem não existe mais (NotFound) também fica no cache, como None.
+# O cache de quem saiu é LRU: passando de MEMBER_CACHE_MAX_ENTRIES, sai primeiro
+# o que venceu e depois o menos usado, até voltar ao limite.
+MEMBER_CACHE_TTL_SECONDS = int(os.getenv("MEMBER_CACHE_TTL_SECONDS", 3600))
+MEMBER_FETCH_CONCURRENCY = int(os.getenv("MEMBER_FETCH_CONCURRENCY", 5))
+MEMBER_CACHE_MAX_ENTRIES = 10000
+
+
+class MemberResolver:
+    def __init__(self, bot, ttl: int = MEMBER_CACHE_TTL_SECONDS, concurrency: int = MEMBER_FETCH_CONCURRENCY):
+        self.bot = bot
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._departed = OrderedDict()
+        self.fetches = 0
+
+    def _cached(self, guild, user_id):
+        member = guild.get_member(user_id) if guild else None
+        if member:
+            return True, member
+        user = self.bot.get_user(user_id)
+        if user:
+            return True, user
+
+        entry = self._departed.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            self._departed.move_to_end(user_id)
+            return True, entry[1]
+        self._departed.pop(user_id, None)
+        return False, None
+
+    async def _fetch(self, user_id):
+        async with self._semaphore:
+            self.fetches += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                user = None
+            except discord.HTTPException as e:
+                logging.warning(f"[AVISO] Falha ao buscar usuário {user_id}: {e}")
+                return None
+        self._departed[user_id] = (time.monotonic() + self.ttl, user)
+        self._departed.move_to_end(user_id)
+        return user
+
+    def _trim(self):
+        if len(self._departed) <= MEMBER_CACHE_MAX_ENTRIES:
+            return
+        now = time.monotonic()
+        for user_id in [k for k, v in self._departed.items() if v[0] <= now]:
+            del self._departed[user_id]
+        while len(self._departed) > MEMBER_CACHE_MAX_ENTRIES:
+            self._departed.popitem(last=False)
+
+    # devolve {user_id: Member/User ou None}, na ordem de user_ids
+    async def resolve_many(self, guild, user_ids):
+        resolved, missing = {}, []
+        for user_id in user_ids:
+            found, user = self._cached(guild, user_id)
+            if found:
+                resolved[user_id] = user
+            elif user_id not in missing:
+                missing.append(user_id)
+
+        if missing:
+            users = await asyncio.gather(*(self._fetch(user_id) for user_id in missing))
+            resolved.update(zip(missing, users))
+            self._trim()
+
+        return {user_id: resolved[user_id] for user_id in user_ids}
+
+    async def resolve(self, guild, user_id):
+        return (await self.resolve_many(guild, [user_id]))[user_id]
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+import time
+
+import discord
+
+import db_async
+
+# Fila de DMs (XP, badges) fora do caminho quente: notify() só enfileira e volta.
+# Um worker envia em ordem, no máximo NOTIFY_RATE_PER_SECOND DMs por segundo; o que
+# chega para o mesmo usuário enquanto ele espera na fila vira um resumo só.
+# Acima de NOTIFY_MAX_PENDING usuários na fila, notificações novas são descartadas
+# (e contadas). Quem desligou as DMs (/notificacoes) fica em dm_optout no banco.
+NOTIFY_RATE_PER_SECOND = float(os.getenv("NOTIFY_RATE_PER_SECOND", 1))
+NOTIFY_MAX_PENDING = int(os.getenv("NOTIFY_MAX_PENDING", 1000))
+NOTIFY_COALESCE_SECONDS = 10
+NOTIFY_MAX_LINES = 15
+
+
+class Notifier:
+    def __init__(self, rate_per_second: float = NOTIFY_RATE_PER_SECOND, max_pending: int = NOTIFY_MAX_PENDING):
+        self.interval = 1 / rate_per_second
+        self.max_pending = max_pending
+        self._pending = {}
+        self._queue = asyncio.Queue()
+        self._optout = set()
+        self._worker = None
+        self._next_send = 0.0
+        self.metrics = {"queued": 0, "coalesced": 0, "sent": 0, "dropped": 0, "opted_out": 0, "failed": 0}
+
+    async def start(self):
+        self._optout = await db_async.get_dm_optouts()
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            self._worker = None
+
+    def is_opted_out(self, user_id: int) -> bool:
+        return user_id in self._optout
+
+    async def set_optout(self, user_id: int, opted_out: bool):
+        await db_async.set_dm_optout(user_id, opted_out)
+        if opted_out:
+            self._optout.add(user_id)
+            self._pending.pop(user_id, None)
+        else:
+            self._optout.discard(user_id)
+
+    def notify(self, user, title: str, line: str, color=discord.Color.blue(), footer: str = None):
+        if user.id in self._optout:
+            self.metrics["opted_out"] += 1
+            return
+
+        entry = self._pending.get(user.id)
+        if entry:
+            entry["lines"].append(line)
+            self.metrics["coalesced"] += 1
+            return
+
+        if len(self._pending) >= self.max_pending:
+            self.metrics["dropped"] += 1
+            if self.metrics["dropped"] % 100 == 1:
+                logging.warning(f"[AVISO] Fila de DMs cheia, notificações descartadas: {self.metrics}")
+            return
+
+        self._pending[user.id] = {"user": user, "title": title, "color": color, "footer": footer, "lines": [line], "at": time.monotonic()}
+        self._queue.put_nowait(user.id)
+        self.metrics["queued"] += 1
+
+    def stats(self) -> dict:
+        return {**self.metrics, "pending": len(self._pending)}
+
+    def _build_embed(self, entry) -> discord.Embed:
+        lines = entry["lines"]
+        if len(lines) == 1:
+            embed = discord.Embed(title=entry["title"], description=lines[0], color=entry["color"])
+            if entry["footer"]:
+                embed.set_footer(text=entry["footer"])
+        else:
+            shown = lines[-NOTIFY_MAX_LINES:]
+            description = "\n".join(f"• {line}" for line in shown)
+            if len(lines) > len(shown):
+                description = f"… e mais {len(lines) - len(shown)} notificações\n" + description
+            embed = discord.Embed(title="🔔 Resumo de notificações", description=description[:4096], color=entry["color"])
+        embed.set_thumbnail(url=entry["user"].display_avatar.url)
+        return embed
+
+    async def _run(self):
+        while True:
+            user_id = await self._queue.get()
+            entry = self._pending.get(user_id)
+            if entry is None:
+                continue
+
+            # espera a janela de agrupamento e a vez no rate limit global
+            now = time.monotonic()
+            wait = max(entry["at"] + NOTIFY_COALESCE_SECONDS, self._next_send) - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            entry = self._pending.pop(user_id, None)
+            if entry is None:
+                continue
+            self._next_send = time.monotonic() + self.interval
+
+            try:
+                await entry["user"].send(embed=self._build_embed(entry))
+                self.metrics["sent"] += 1
+            except discord.HTTPException:
+                self.metrics["failed"] += 1
+            except Exception as e:
+                self.metrics["failed"] += 1
+                logging.error(f"Erro ao enviar DM para {user_id}: {e}")
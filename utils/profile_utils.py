@@ -1,6 +1,7 @@
 from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageFilter, ImageColor
 import requests, io, numpy as np
 import math
+import functools
 
 # 🎖️ BADGES
 BADGE_EMOJIS = {
@@ -19,15 +20,32 @@ BADGE_RULES = {
     "legend": lambda xp, msgs, call: xp >= 10000
 }
 
+# Valores em que alguma regra de BADGE_RULES muda de resultado. Quem concede XP
+# ou mensagens só reavalia as badges quando o valor cruza um deles; o 1 do XP
+# cobre o primeiro XP do usuário (newbie). Mudou uma regra, muda aqui também.
+BADGE_THRESHOLDS = {
+    "xp": (1, 100, 2000, 10000),
+    "messages": (1000,),
+    "call_seconds": (36000,)
+}
+
+
+def crosses_badge_threshold(field, old, new):
+    low, high = min(old, new), max(old, new)
+    return any(low < limit <= high for limit in BADGE_THRESHOLDS[field])
+
+
+# 🏅 Badges cujas regras o usuário cumpre e que ele ainda não tem
+def badges_earned(current, xp, messages, call_seconds):
+    return [key for key, rule in BADGE_RULES.items() if key not in current and rule(xp, messages, call_seconds)]
+
 
 # 🏅 Verifica e adiciona badges automaticamente
 def check_and_award_badges(db, user_id, guild_id, xp, messages, call_seconds):
     current = set(b['badge_key'] for b in db.get_user_badges(user_id , guild_id))
-    new = []
-    for key, rule in BADGE_RULES.items():
-        if rule(xp, messages , call_seconds) and key not in current:
-            db.add_user_badge(user_id, guild_id , key)
-            new.append(key)
+    new = badges_earned(current, xp, messages, call_seconds)
+    for key in new:
+        db.add_user_badge(user_id, guild_id , key)
     return new
 
 
@@ -58,40 +76,92 @@ def generate_profile_text(xp, messages, call_seconds, vitorias, derrotas):
             f"🏆 Vitórias: {vitorias} | 💀 Derrotas: {derrotas}")
 
 
-# 🎨 Geração do perfil com visual moderno
+# 🖌️ Camadas fixas do card, geradas com NumPy uma vez por tamanho/cor e reaproveitadas
+@functools.lru_cache(maxsize=8)
+def diagonal_gradient(size, color1, color2):
+    w, h = size
+    t = ((np.arange(w)[None, :] + np.arange(h)[:, None]) / (w + h))[..., None]
+    rgb = (np.array(color1) * (1 - t) + np.array(color2) * t).astype(np.uint8)
+    alpha = np.full((h, w, 1), 255, dtype=np.uint8)
+    return Image.fromarray(np.concatenate([rgb, alpha], axis=2), "RGBA")
+
+
+@functools.lru_cache(maxsize=8)
+def gradient_bar(w, h, start, end):
+    # faixa com a largura total da barra; cada coluna tem h+1 pixels, como o draw.line antigo
+    ratio = (np.arange(w) / w)[:, None]
+    rgb = (np.array(start) * (1 - ratio) + np.array(end) * ratio).astype(np.uint8)
+    return Image.fromarray(np.ascontiguousarray(np.broadcast_to(rgb, (h + 1, w, 3))), "RGB")
+
+
+@functools.lru_cache(maxsize=1)
+def avatar_mask():
+    mask = Image.new("L", (200, 200), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, 200, 200), fill=255)
+    return mask
+
+
+@functools.lru_cache(maxsize=1)
+def avatar_border():
+    border = Image.new("RGBA", (210, 210), (0, 0, 0, 0))
+    ImageDraw.Draw(border).ellipse((0,0,210,210), outline=(100,180,255,255), width=8)
+    return border
+
+
+@functools.lru_cache(maxsize=1)
+def profile_fonts():
+    try:
+        return (
+            ImageFont.truetype("DejaVuSans-Bold.ttf", 32),
+            ImageFont.truetype("DejaVuSans.ttf", 18),
+            ImageFont.truetype("DejaVuSans.ttf", 14),
+        )
+    except:
+        default = ImageFont.load_default()
+        return default, default, default
+
+
+# 🖼️ Avatar pronto para o card: 200x200 RGBA com o alpha já recortado em círculo.
+# Devolve os bytes crus (tobytes), que é o que o avatar_cache guarda e o worker recebe.
+AVATAR_SIZE = (200, 200)
+
+
+def avatar_tile(image_bytes):
+    avatar = Image.open(io.BytesIO(image_bytes)).convert("RGBA").resize(AVATAR_SIZE)
+    avatar = ImageOps.fit(avatar, AVATAR_SIZE)
+    avatar.putalpha(avatar_mask())
+    return avatar.tobytes()
+
+
+# 🎨 Geração do perfil a partir de um discord.Member (download síncrono do avatar)
 def generate_profile_image(member, xp, messages, call_seconds, vitorias, derrotas, badges):
+    try:
+        tile = avatar_tile(requests.get(member.display_avatar.url, timeout=5).content)
+    except:
+        tile = None
+    png = render_profile_card(member.display_name, tile, xp, messages, call_seconds, vitorias, derrotas, badges)
+    return io.BytesIO(png)
+
+
+# 🎨 Geração do perfil com visual moderno; só recebe dados simples e devolve o PNG
+# em bytes, para poder rodar num processo separado (utils/render_service.py).
+# tile vem de avatar_tile(); None desenha o avatar cinza padrão.
+def render_profile_card(display_name, tile, xp, messages, call_seconds, vitorias, derrotas, badges):
     W, H = 900, 300
-    base = Image.new("RGBA", (W, H), (0, 0, 0, 0))
 
     # --- GRADIENTE DE FUNDO (DIAGONAL) ---
-    def diagonal_gradient(size, color1, color2):
-        w, h = size
-        grad = np.zeros((h, w, 4), dtype=np.uint8)
-        for y in range(h):
-            for x in range(w):
-                t = (x + y) / (w + h)
-                r = int(color1[0]*(1-t) + color2[0]*t)
-                g = int(color1[1]*(1-t) + color2[1]*t)
-                b = int(color1[2]*(1-t) + color2[2]*t)
-                grad[y, x] = (r, g, b, 255)
-        return Image.fromarray(grad, "RGBA")
-
-    grad = diagonal_gradient((W, H), (25, 25, 45), (75, 85, 130))
-    base = Image.alpha_composite(base, grad)
+    base = diagonal_gradient((W, H), (25, 25, 45), (75, 85, 130)).copy()
 
     # --- AVATAR COM SOMBRA E BORDA ---
-    try:
-        avatar_bytes = requests.get(member.display_avatar.url, timeout=5).content
-        avatar = Image.open(io.BytesIO(avatar_bytes)).convert("RGBA").resize((200, 200))
-    except:
-        avatar = Image.new("RGBA", (200, 200), (120, 120, 120, 255))
+    if tile:
+        avatar = Image.frombytes("RGBA", AVATAR_SIZE, tile)
+    else:
+        avatar = Image.new("RGBA", AVATAR_SIZE, (120, 120, 120, 255))
 
-    mask = Image.new("L", (200, 200), 0)
-    ImageDraw.Draw(mask).ellipse((0, 0, 200, 200), fill=255)
-    avatar = ImageOps.fit(avatar, (200, 200))
+    mask = avatar_mask()
 
-    # sombra suave atrás do avatar
-    shadow = avatar.copy().convert("RGBA").filter(ImageFilter.GaussianBlur(10))
+    # sombra suave atrás do avatar (desfoca só as cores; o recorte vem da máscara)
+    shadow = avatar.convert("RGB").filter(ImageFilter.GaussianBlur(10))
     shadow_layer = Image.new("RGBA", (W, H), (0, 0, 0, 0))
     shadow_layer.paste(shadow, (45, 55), mask)
     base = Image.alpha_composite(base, shadow_layer)
@@ -99,25 +169,17 @@ def generate_profile_image(member, xp, messages, call_seconds, vitorias, derrota
     # avatar e borda
     avatar_layer = Image.new("RGBA", (W, H), (0, 0, 0, 0))
     avatar_layer.paste(avatar, (40, 50), mask)
-    border = Image.new("RGBA", (210, 210), (0, 0, 0, 0))
-    ImageDraw.Draw(border).ellipse((0,0,210,210), outline=(100,180,255,255), width=8)
+    border = avatar_border()
     avatar_layer.paste(border, (35, 45), border)
     base = Image.alpha_composite(base, avatar_layer)
 
     # --- FONTES ---
-    try:
-        font_bold = ImageFont.truetype("DejaVuSans-Bold.ttf", 32)
-        font = ImageFont.truetype("DejaVuSans.ttf", 18)
-        font_small = ImageFont.truetype("DejaVuSans.ttf", 14)
-    except:
-        font_bold = ImageFont.load_default()
-        font = ImageFont.load_default()
-        font_small = ImageFont.load_default()
+    font_bold, font, font_small = profile_fonts()
 
     draw = ImageDraw.Draw(base)
 
     # --- TEXTOS ---
-    draw.text((270, 50), member.display_name, font=font_bold, fill=(255,255,255))
+    draw.text((270, 50), display_name, font=font_bold, fill=(255,255,255))
     draw.text((270, 90), f"✨ XP: {xp}", font=font, fill=(180,200,255))
     draw.text((270, 115), f"💬 Mensagens: {messages}", font=font, fill=(200,255,200))
     draw.text((270, 140), f"🕒 Tempo em call: {call_seconds//3600}h {(call_seconds//60)%60}m", font=font, fill=(255,220,200))
@@ -130,16 +192,10 @@ def generate_profile_image(member, xp, messages, call_seconds, vitorias, derrota
 
     draw.rounded_rectangle([bar_x, bar_y, bar_x+bar_w, bar_y+bar_h], radius=15, fill=(40,40,60))
 
-    def draw_gradient_bar(draw, x, y, w, h, pct):
-        start = ImageColor.getrgb("#4facfe")
-        end = ImageColor.getrgb("#00f2fe")
-        for i in range(int(w * pct)):
-            ratio = i / w
-            r = int(start[0]*(1-ratio) + end[0]*ratio)
-            g = int(start[1]*(1-ratio) + end[1]*ratio)
-            b = int(start[2]*(1-ratio) + end[2]*ratio)
-            draw.line([(x+i, y), (x+i, y+h)], fill=(r,g,b), width=1)
-    draw_gradient_bar(draw, bar_x, bar_y, bar_w, bar_h, pct)
+    filled = int(bar_w * pct)
+    if filled > 0:
+        bar = gradient_bar(bar_w, bar_h, ImageColor.getrgb("#4facfe"), ImageColor.getrgb("#00f2fe"))
+        base.paste(bar.crop((0, 0, filled, bar_h + 1)), (bar_x, bar_y))
 
     draw.text((bar_x, bar_y - 25), f"Nível {level_data['level']} ({int(pct*100)}%)", font=font, fill=(255,255,255))
     draw.text((bar_x + bar_w - 180, bar_y + 35),
@@ -160,21 +216,20 @@ def generate_profile_image(member, xp, messages, call_seconds, vitorias, derrota
     # --- FINALIZAÇÃO ---
     buffer = io.BytesIO()
     base.save(buffer, "PNG")
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 
 # ⚙️ Sistema de nível
+# O nível n custa 500 + 100*n XP, então o XP acumulado até o nível n é 50n² + 450n.
+# Resolvendo a quadrática: n = (isqrt(2025 + 2*xp) - 45) // 10, sem laço.
+def level_floor_xp(level):
+    return 50 * level * level + 450 * level
+
+
 def calculate_level(xp: int):
-    level = 0
-    xp_needed = 500
-    remaining_xp = xp
-    while remaining_xp >= xp_needed:
-        remaining_xp -= xp_needed
-        level += 1
-        xp_needed = 500 + (level * 100) 
-    next_level_xp = xp_needed
-    xp_into_level = remaining_xp
+    level = (math.isqrt(2025 + 2 * xp) - 45) // 10 if xp > 0 else 0
+    next_level_xp = 500 + (level * 100)
+    xp_into_level = xp - level_floor_xp(level)
     xp_to_next = next_level_xp - xp_into_level
     progress_pct = (xp_into_level / next_level_xp) if next_level_xp > 0 else 0
     return {
@@ -184,3 +239,13 @@ def calculate_level(xp: int):
         "next_level_xp": next_level_xp,
         "progress": progress_pct
     }
+
+
+# ⚙️ Níveis de uma coluna inteira de XP de uma vez (ranking, recálculo em massa)
+def calculate_levels(xps) -> np.ndarray:
+    xp = np.maximum(np.asarray(xps, dtype=np.int64), 0)
+    levels = ((np.sqrt(2025 + 2 * xp) - 45) // 10).astype(np.int64)
+    # o sqrt em float pode errar por 1 bem na fronteira de um nível
+    levels -= level_floor_xp(levels) > xp
+    levels += level_floor_xp(levels + 1) <= xp
+    return levels
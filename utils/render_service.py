@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import profile_utils
+
+# Renderização dos cards de perfil fora do event loop, num pool de processos.
+# PROFILE_RENDER_WORKERS define quantos processos; PROFILE_RENDER_MAX_QUEUE quantos
+# pedidos podem esperar além dos que já estão renderizando antes de recusar.
+RENDER_WORKERS = int(os.getenv("PROFILE_RENDER_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+RENDER_MAX_QUEUE = int(os.getenv("PROFILE_RENDER_MAX_QUEUE", 16))
+
+
+class RendererBusy(Exception):
+    pass
+
+
+class ProfileRenderer:
+    def __init__(self, workers: int = RENDER_WORKERS, max_queue: int = RENDER_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue_depth = 0
+        self.rendered = 0
+        self.rejected = 0
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn: os workers não herdam as threads e conexões do processo do bot
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def render(self, display_name, tile, xp, messages, call_seconds, vitorias, derrotas, badges) -> bytes:
+        if self.queue_depth >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise RendererBusy(f"{self.queue_depth} cards na fila")
+
+        self.queue_depth += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            png = await loop.run_in_executor(
+                executor,
+                profile_utils.render_profile_card,
+                display_name, tile, xp, messages, call_seconds, vitorias, derrotas, list(badges)
+            )
+            self.rendered += 1
+            return png
+        except BrokenProcessPool:
+            logging.error("Pool de renderização quebrou, recriando no próximo pedido")
+            # encerra o pool quebrado antes de soltar: sem isso a thread de
+            # gerenciamento e os processos restantes ficam vivos até o GC.
+            # Outro pedido pode já ter criado o pool novo; esse fica.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self._executor is executor:
+                self._executor = None
+            raise
+        finally:
+            self.queue_depth -= 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import logging
+import time
+
+import db_async
+
+# Timers que sobrevivem a restart (fim de boost, fim de mute, canal temporário).
+# Cada job fica em scheduled_jobs e num min-heap de (expires_at, id); uma única
+# task dorme até o próximo vencimento e roda o handler do tipo do job.
+# (kind, job_key) é único: agendar de novo o mesmo job só troca o horário, e a
+# entrada antiga no heap é ignorada porque o expires_at não bate mais.
+# Os cogs registram os handlers no __init__; start() carrega os pendentes do
+# banco quando o bot fica pronto, e o que venceu com o bot fora roda na hora.
+SCHEDULER_MAX_SLEEP_SECONDS = 3600
+# handler que falha fica no banco e roda de novo: 30s, 60s, 120s... até 1h,
+# no máximo SCHEDULER_MAX_ATTEMPTS vezes
+SCHEDULER_RETRY_BASE_SECONDS = 30
+SCHEDULER_RETRY_MAX_SECONDS = 3600
+SCHEDULER_MAX_ATTEMPTS = 20
+
+
+class Scheduler:
+    def __init__(self):
+        self._handlers = {}
+        self._jobs = {}
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._waiter = None
+        self._running = set()
+        self._attempts = {}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def register(self, kind: str, handler):
+        # handler: async def handler(payload: dict)
+        self._handlers[kind] = handler
+
+    def _push(self, job_id, kind, expires_at, payload):
+        self._jobs[job_id] = (kind, expires_at, payload)
+        heapq.heappush(self._heap, (expires_at, job_id))
+        self._wakeup.set()
+
+    async def start(self):
+        if self._waiter is not None:
+            return len(self._jobs)
+        for job_id, kind, expires_at, payload in await db_async.get_scheduled_jobs():
+            self._push(job_id, kind, expires_at, payload)
+        self._waiter = asyncio.create_task(self._run())
+        return len(self._jobs)
+
+    def stop(self):
+        if self._waiter:
+            self._waiter.cancel()
+            self._waiter = None
+
+    async def schedule(self, kind: str, job_key: str, delay: float, payload: dict, guild_id: int = None):
+        return await self.schedule_at(kind, job_key, time.time() + delay, payload, guild_id)
+
+    async def schedule_at(self, kind: str, job_key: str, expires_at: float, payload: dict, guild_id: int = None):
+        job_id = await db_async.schedule_job(kind, job_key, guild_id, expires_at, payload)
+        if job_id is not None:
+            self._push(job_id, kind, expires_at, payload)
+        return job_id
+
+    async def cancel(self, kind: str, job_key: str):
+        job_id = await db_async.cancel_scheduled_job(kind, job_key)
+        if job_id is not None:
+            self._jobs.pop(job_id, None)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job[1] != expires_at:
+                    continue
+                del self._jobs[job_id]
+                task = asyncio.create_task(self._fire(job_id, *job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+            timeout = SCHEDULER_MAX_SLEEP_SECONDS
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, job_id, kind, expires_at, payload):
+        handler = self._handlers.get(kind)
+        if handler is None:
+            # cog do tipo não carregou: o job fica no banco para o próximo start
+            logging.warning(f"[AVISO] Nenhum handler para o job '{kind}' ({job_id})")
+            return
+        try:
+            await handler(payload)
+        except Exception as e:
+            attempts = self._attempts.get(job_id, 0) + 1
+            if attempts >= SCHEDULER_MAX_ATTEMPTS:
+                logging.error(f"Job '{kind}' ({job_id}) desistido após {attempts} tentativas: {e}")
+                self._attempts.pop(job_id, None)
+                await db_async.delete_scheduled_job(job_id, expires_at)
+                return
+            delay = min(SCHEDULER_RETRY_BASE_SECONDS * 2 ** (attempts - 1), SCHEDULER_RETRY_MAX_SECONDS)
+            logging.error(f"Erro no job '{kind}' ({job_id}), tentativa {attempts}; nova tentativa em {delay}s: {e}")
+            retry_at = time.time() + delay
+            if await db_async.reschedule_job(job_id, expires_at, retry_at):
+                self._attempts[job_id] = attempts
+                self._push(job_id, kind, retry_at, payload)
+            return
+        self._attempts.pop(job_id, None)
+        await db_async.delete_scheduled_job(job_id, expires_at)
@@ -0,0 +1,75 @@
+from collections import Counter
+
+# Sessões de voz abertas, indexadas por (guild_id, user_id): o mesmo usuário em
+# call em duas guilds tem duas sessões. Entrar, sair e trocar de canal são O(1),
+# e a contagem por guild é mantida junto para responder "quantos estão em call".
+
+
+class VoiceSession:
+    __slots__ = ("guild_id", "user_id", "channel_id", "joined_at", "accounted_at")
+
+    def __init__(self, guild_id, user_id, channel_id, joined_at, accounted_at=None):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.joined_at = joined_at
+        # até onde o tempo desta sessão já foi para call_time
+        self.accounted_at = joined_at if accounted_at is None else accounted_at
+
+
+class VoiceSessionRegistry:
+    def __init__(self):
+        self._sessions = {}
+        self._per_guild = Counter()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, key):
+        return key in self._sessions
+
+    def get(self, guild_id, user_id):
+        return self._sessions.get((guild_id, user_id))
+
+    def sessions(self):
+        return list(self._sessions.values())
+
+    # devolve a sessão nova, ou None se já havia uma (ela continua)
+    def join(self, guild_id, user_id, channel_id, now, accounted_at=None):
+        key = (guild_id, user_id)
+        if key in self._sessions:
+            return None
+        session = VoiceSession(guild_id, user_id, channel_id, now, accounted_at)
+        self._sessions[key] = session
+        self._per_guild[guild_id] += 1
+        return session
+
+    def move(self, guild_id, user_id, channel_id):
+        session = self._sessions.get((guild_id, user_id))
+        if session:
+            session.channel_id = channel_id
+        return session
+
+    def leave(self, guild_id, user_id):
+        session = self._sessions.pop((guild_id, user_id), None)
+        if session:
+            self._per_guild[guild_id] -= 1
+            if not self._per_guild[guild_id]:
+                del self._per_guild[guild_id]
+        return session
+
+    def count(self, guild_id):
+        return self._per_guild.get(guild_id, 0)
+
+    def counts(self):
+        return dict(self._per_guild)
+
+    # quem está em call agora segundo o cache do gateway: {(guild_id, user_id): channel_id}
+    @staticmethod
+    def snapshot(guilds):
+        return {
+            (guild.id, user_id): state.channel.id
+            for guild in guilds
+            for user_id, state in guild.voice_states.items()
+            if state.channel is not None
+        }